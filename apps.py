@@ -5,3 +5,10 @@ from django.apps import AppConfig
 class WireConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.wire'
+
+    def ready(self):
+        # Compile and validate the workflow once, so a broken config fails at startup.
+        from .workflow import get_workflow_state_machine
+        get_workflow_state_machine()
+
+        from . import signals  # noqa: F401
@@ -0,0 +1,72 @@
+# apps/wire/authorization.py
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _group_cache_timeout():
+    """
+    Seconds to keep a user's group names in the shared cache between requests.
+    Set WIRE_GROUP_CACHE_TIMEOUT in settings to enable; 0/None keeps it per request.
+    """
+    return getattr(settings, 'WIRE_GROUP_CACHE_TIMEOUT', 0)
+
+
+def _group_cache_key(user_id):
+    return f"wire:user-groups:{user_id}"
+
+
+def invalidate_user_groups(user_ids):
+    """Drops cached group names for the given users (see signals.py)."""
+    if _group_cache_timeout():
+        cache.delete_many([_group_cache_key(user_id) for user_id in user_ids])
+
+
+class WireAuthorizationContext:
+    """
+    The requesting user's group membership, loaded once.
+
+    Permission classes and ManufacturingWorkflowService consult this instead of
+    querying `user.groups`, so a request pays for at most one group query (none
+    when the shared cache is enabled and warm).
+    """
+    def __init__(self, user, group_names):
+        self.user = user
+        # Ordered by group pk, matching the `user.groups.first()` the permissions used to rely on.
+        self.group_names = tuple(group_names)
+        self.groups = frozenset(self.group_names)
+
+    @classmethod
+    def for_user(cls, user):
+        timeout = _group_cache_timeout()
+        key = _group_cache_key(user.pk)
+        group_names = cache.get(key) if timeout else None
+        if group_names is None:
+            group_names = list(user.groups.order_by('pk').values_list('name', flat=True))
+            if timeout:
+                cache.set(key, group_names, timeout)
+        return cls(user, group_names)
+
+    @classmethod
+    def for_request(cls, request):
+        """Returns the context cached on the request, building it on first use."""
+        context = getattr(request, '_wire_auth_context', None)
+        if context is None or context.user.pk != request.user.pk:
+            context = cls.for_user(request.user)
+            request._wire_auth_context = context
+        return context
+
+    @property
+    def is_superuser(self):
+        return self.user.is_superuser
+
+    @property
+    def primary_group(self):
+        """The user's first group, or None if they have none."""
+        return self.group_names[0] if self.group_names else None
+
+    def in_group(self, group_name):
+        return group_name in self.groups
+
+    def can_act_as(self, group_name):
+        """Membership in `group_name`, or superuser."""
+        return self.in_group(group_name) or self.is_superuser
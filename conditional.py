@@ -0,0 +1,36 @@
+# apps/wire/conditional.py
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+def make_etag(*parts):
+    """Strong ETag from the values that determine a representation."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+class Validators:
+    """
+    ETag for one representation, computed from version stamps instead of
+    from the serialized body.
+
+    No Last-Modified is sent: the newest stamp can move backwards (a deleted
+    raw material drops out of the max) and shared rows carry no timestamp at
+    all, so If-Modified-Since could answer 304 for a changed representation.
+    """
+    def __init__(self, etag):
+        self.etag = etag
+
+    def not_modified(self, request):
+        """The 304 (or 412) response for `request`, or None if the body must be sent."""
+        response = get_conditional_response(request, etag=self.etag)
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        # Clients must revalidate before reusing a stored copy.
+        response['Cache-Control'] = 'private, no-cache'
+        return response
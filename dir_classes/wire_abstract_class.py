@@ -26,6 +26,9 @@ class FormSpecifications(models.Model):
         blank=True
     )
 
+    # Bumped on every save; part of the conditional GET validators (see conditional.py).
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         abstract = True
 
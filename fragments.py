@@ -0,0 +1,153 @@
+# apps/wire/fragments.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+from .models import (
+    DeviceRawMaterial, DeviceAuthorization, DeviceChecklist, DeviceProduction, DeviceProduct,
+    LicenseProduction, RawMaterialSpecifications, Packaging, Production, ProductionWaste, QcTestWire,
+)
+from .dir_classes.device_settings import (
+    FormExtruderSettings, FormRadiantSettings, FormFiberWeaverSettings, FormShieldWeaverSettings,
+)
+from .dir_classes.production_qc_settings import (
+    ProductionExtruderQcTestWire, ProductionRadiantQcTestWire,
+    ProductionFiberWeaverQcTestWire, ProductionShieldWeaverQcTestWire,
+)
+
+GENERATION_KEY = 'wire:fragments:generation'
+
+FORM_MODELS = (DeviceRawMaterial, DeviceAuthorization, DeviceChecklist, DeviceProduction, DeviceProduct)
+
+
+def _production_owner(instance):
+    production = Production.objects.filter(pk=instance.production_id).values_list('device_production_id', flat=True).first()
+    return DeviceProduction, production
+
+
+# Rows rendered inside a form's representation -> (form model, form pk) they belong to.
+NESTED_OWNERS = {
+    QcTestWire: lambda instance: (ContentType.objects.get_for_id(instance.content_type_id).model_class(), instance.object_id),
+    LicenseProduction: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    RawMaterialSpecifications: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    Packaging: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    FormExtruderSettings: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    FormRadiantSettings: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    FormFiberWeaverSettings: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    FormShieldWeaverSettings: lambda instance: (DeviceAuthorization, instance.authorization_id),
+    Production: lambda instance: (DeviceProduction, instance.device_production_id),
+    ProductionWaste: lambda instance: (DeviceProduction, instance.device_production_id),
+    ProductionExtruderQcTestWire: _production_owner,
+    ProductionRadiantQcTestWire: _production_owner,
+    ProductionFiberWeaverQcTestWire: _production_owner,
+    ProductionShieldWeaverQcTestWire: _production_owner,
+}
+
+
+def _version_key(model, pk):
+    return f"wire:fragments:{model._meta.model_name}:{pk}"
+
+
+def _max_entries():
+    """How many fragments each worker keeps (WIRE_FRAGMENT_CACHE_SIZE; 0 disables the cache)."""
+    return getattr(settings, 'WIRE_FRAGMENT_CACHE_SIZE', 2048)
+
+
+class FragmentCache:
+    """
+    Serialized form representations, held in process memory with LRU eviction.
+
+    Entries are keyed by the serializer, the form's pk and everything the
+    representation depends on: the form's updated_at, its process stage/step,
+    a per-form version counter and a global generation. The counters live in
+    Django's cache and are bumped by signals.py when the form, one of its nested
+    rows or a referenced lookup/product/customer changes, so with a shared cache
+    backend every worker stops serving the old fragment on its next read. With a
+    per-process backend such as LocMemCache the counters are per worker as well,
+    so nested or shared rows changed through another worker go unnoticed until
+    the entry is evicted; run more than one worker only with a shared cache.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def invalidate(self, model, pk):
+        """Drops the fragments of one form, in every worker."""
+        if pk is None:
+            return
+        self._bump(_version_key(model, pk))
+
+    def invalidate_all(self):
+        self._bump(GENERATION_KEY)
+
+    def _bump(self, key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            self._seed(key)
+
+    def _seed(self, key):
+        # Seeded from the clock so a missing or evicted counter never reissues
+        # a value an older LRU entry was stored under.
+        cache.add(key, time.time_ns(), None)
+        return cache.get(key)
+
+    def _versions(self, model, pk):
+        key = _version_key(model, pk)
+        versions = cache.get_many([GENERATION_KEY, key])
+        generation = versions.get(GENERATION_KEY)
+        if generation is None:
+            generation = self._seed(GENERATION_KEY)
+        version = versions.get(key)
+        if version is None:
+            version = self._seed(key)
+        return generation, version
+
+    def get_or_render(self, serializer, instance, render):
+        """
+        The cached representation of `instance` by `serializer`, or `render()`,
+        stored for the next read. Callers get their own copy.
+        """
+        max_entries = _max_entries()
+        if not max_entries or instance.pk is None:
+            return render()
+        process = getattr(instance, 'manufacturing_process', None)
+        key = (
+            type(serializer), instance.pk, getattr(instance, 'updated_at', None),
+            process and (process.pk, process.stage, process.current_step),
+            *self._versions(type(instance), instance.pk),
+        )
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if fragment is None:
+            fragment = render()
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = fragment
+                while len(self._entries) > max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return copy.deepcopy(fragment)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+fragment_cache = FragmentCache()
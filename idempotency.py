@@ -0,0 +1,140 @@
+# apps/wire/idempotency.py
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _ttl():
+    """How long stored responses are replayed, in seconds (default: 24 hours)."""
+    return timedelta(seconds=getattr(settings, 'WIRE_IDEMPOTENCY_TTL', 24 * 60 * 60))
+
+
+class IdempotentReplay(Exception):
+    """Short-circuits a request whose response is already known."""
+    def __init__(self, response):
+        self.response = response
+
+
+class IdempotencyGuard:
+    """
+    Claims an Idempotency-Key for one request and records its response.
+
+    The key is claimed with an INSERT before the view runs, so a retry that
+    arrives while the first attempt is still executing gets a 409 instead of
+    running it twice. Only successful (2xx) responses are kept; failures
+    release the key so the client can retry.
+    """
+    def __init__(self, request, key):
+        self.request = request
+        self.key = key[:255]
+        self.scope = f"{request.method} {request.path}"[:255]
+        payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+        self.request_hash = hashlib.sha256(payload.encode()).hexdigest()
+        self.record = None
+
+    def begin(self):
+        """Returns a Response to replay, or None after claiming the key for this request."""
+        now = timezone.now()
+        IdempotencyRecord.objects.filter(created_at__lt=now - _ttl()).delete()
+        try:
+            with transaction.atomic():
+                self.record = IdempotencyRecord.objects.create(
+                    user=self.request.user, key=self.key, scope=self.scope, request_hash=self.request_hash,
+                )
+            return None
+        except IntegrityError:
+            existing = IdempotencyRecord.objects.filter(user=self.request.user, key=self.key).first()
+
+        if existing is None:
+            # The other attempt failed and released the key in the meantime.
+            return self.begin()
+        if existing.scope != self.scope or existing.request_hash != self.request_hash:
+            return Response(
+                {"detail": f"This {IDEMPOTENCY_HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if existing.status_code is None:
+            return Response(
+                {"detail": "A request with this Idempotency-Key is still being processed."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        response = Response(existing.response_body, status=existing.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def finish(self, response):
+        """Stores a successful response, or releases the key."""
+        if self.record is None:
+            return
+        if status.is_success(response.status_code):
+            self.record.status_code = response.status_code
+            self.record.response_body = response.data
+            self.record.save(update_fields=['status_code', 'response_body'])
+        else:
+            self.release()
+        self.record = None
+
+    def release(self):
+        if self.record is not None:
+            self.record.delete()
+            self.record = None
+
+
+class IdempotencyMixin:
+    """
+    Honors the Idempotency-Key header on a view's unsafe requests.
+
+    APIViews list the HTTP methods in `idempotent_methods`; viewsets also restrict
+    it to `idempotent_actions`. The check runs before permissions so a retried
+    create is replayed even though the form now exists.
+    """
+    idempotent_methods = ('POST',)
+    idempotent_actions = None
+
+    def _wants_idempotency(self, request):
+        if request.method not in self.idempotent_methods:
+            return False
+        return self.idempotent_actions is None or getattr(self, 'action', None) in self.idempotent_actions
+
+    def initial(self, request, *args, **kwargs):
+        self.idempotency = None
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key and self._wants_idempotency(request):
+            self.perform_authentication(request)
+            if request.user and request.user.is_authenticated:
+                guard = IdempotencyGuard(request, key)
+                replay = guard.begin()
+                if replay is not None:
+                    raise IdempotentReplay(replay)
+                self.idempotency = guard
+        super().initial(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, IdempotentReplay):
+            return exc.response
+        guard = getattr(self, 'idempotency', None)
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Unhandled errors never reach finalize_response; free the key here.
+            if guard:
+                guard.release()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        guard = getattr(self, 'idempotency', None)
+        if guard:
+            guard.finish(response)
+        return response
@@ -0,0 +1,123 @@
+# apps/wire/ingestion.py
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import DeviceProduction, Production
+from .serializers import ProductionSerializer
+
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+CSV_CONTENT_TYPES = ('text/csv',)
+
+
+def iter_records(stream, content_type):
+    """
+    Yields (line_number, record_dict) from an NDJSON or CSV byte stream, one line
+    at a time, so the body is never held in memory as a whole. Lines that cannot
+    be decoded are yielded as (line_number, ValueError).
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    lines = iter(stream.readline, b'')
+
+    if media_type in NDJSON_CONTENT_TYPES:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ValueError("Each line must be a JSON object.")
+                continue
+            yield line_number, record
+
+    elif media_type in CSV_CONTENT_TYPES:
+        reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+        for record in reader:
+            # Header is line 1; empty cells are treated as missing values.
+            yield reader.line_num, {key: value for key, value in record.items() if key and value != ''}
+
+    else:
+        raise ValidationError(
+            f"Unsupported content type '{media_type}'. "
+            f"Use one of: {', '.join(NDJSON_CONTENT_TYPES + CSV_CONTENT_TYPES)}."
+        )
+
+
+class ProductionRowImporter:
+    """
+    Validates streamed spool records with ProductionSerializer's rules and inserts
+    them into one DeviceProduction in chunked bulk_create batches.
+
+    The import is all-or-nothing: every line is checked, and if any fails the
+    transaction is rolled back and the per-line errors are returned.
+    """
+    chunk_size = 1000
+    max_reported_errors = 100
+
+    def __init__(self, device_production, field_policy=None):
+        self.device_production = device_production
+        self.field_policy = field_policy
+        # One unbound serializer is reused for every row; its fields are built once.
+        self.validator = ProductionSerializer()
+        self.created = 0
+        self.errors = []
+        self.error_count = 0
+
+    def _add_error(self, line_number, detail):
+        self.error_count += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append({'line': line_number, 'errors': detail})
+
+    def _validate(self, line_number, record):
+        record.pop('id', None)  # imports always create new rows
+        if self.field_policy:
+            error = self.field_policy.check({'production': [record]})
+            if error:
+                self._add_error(line_number, error)
+                return None
+        try:
+            return self.validator.run_validation(record)
+        except ValidationError as e:
+            self._add_error(line_number, e.detail)
+            return None
+
+    def _flush(self, batch):
+        Production.objects.bulk_create(batch)
+        self.created += len(batch)
+        batch.clear()
+
+    def run(self, stream, content_type):
+        """Imports every record from `stream`; returns True if all rows were inserted."""
+        with transaction.atomic():
+            batch = []
+            for line_number, record in iter_records(stream, content_type):
+                if isinstance(record, ValueError):
+                    self._add_error(line_number, str(record))
+                    continue
+                validated = self._validate(line_number, record)
+                if validated is None or self.error_count:
+                    # After the first error keep validating, but stop writing.
+                    continue
+                validated.pop('id', None)
+                batch.append(Production(device_production=self.device_production, **validated))
+                if len(batch) >= self.chunk_size:
+                    self._flush(batch)
+
+            if self.error_count:
+                transaction.set_rollback(True)
+                self.created = 0
+                return False
+            if batch:
+                self._flush(batch)
+            if self.created:
+                # bulk_create skips save(); bump the form so conditional GETs see the new rows.
+                DeviceProduction.objects.filter(pk=self.device_production.pk).update(updated_at=timezone.now())
+        return True
@@ -0,0 +1,106 @@
+# apps/wire/lookups.py
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .dir_classes.wire_abstract_class import (
+    QcTestWireDefinition, Material, CoatingMaterial, WireFormName, UnsharedFieldStructure,
+)
+
+# Rarely changing reference tables, by the key they have in the bootstrap payload.
+LOOKUP_MODELS = {
+    'materials': Material,
+    'coating_materials': CoatingMaterial,
+    'wire_form_names': WireFormName,
+    'qc_test_wire_definitions': QcTestWireDefinition,
+    'unshared_field_structures': UnsharedFieldStructure,
+}
+
+VERSION_KEY = 'wire:lookups:version'
+
+
+def _shared_cache_timeout():
+    """
+    Seconds to keep loaded lookup tables in the shared cache, so other worker
+    processes skip the database too. Set WIRE_LOOKUP_CACHE_TIMEOUT to enable.
+    """
+    return getattr(settings, 'WIRE_LOOKUP_CACHE_TIMEOUT', 0)
+
+
+class LookupCache:
+    """
+    All lookup tables, held in process memory and tagged with a version counter.
+
+    The counter lives in Django's cache and is bumped by signals.py whenever a
+    lookup row is saved or deleted; each access compares it with the version
+    held here and reloads on mismatch. With a shared cache backend every worker
+    therefore sees a write on its next request. With a per-process backend such
+    as LocMemCache the counter is per worker too, so other workers keep serving
+    their old tables; deployments with more than one worker need a shared cache.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._tables = {}
+        self._by_pk = {}
+        self._memo = {}
+
+    def version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # Seeded from the clock so a flushed cache never reissues an old version (and ETag).
+            cache.add(VERSION_KEY, time.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def invalidate(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, time.time_ns(), None)
+
+    def _load(self, version):
+        timeout = _shared_cache_timeout()
+        key = f"wire:lookups:tables:{version}"
+        tables = cache.get(key) if timeout else None
+        if tables is None:
+            tables = {name: list(model.objects.order_by('pk')) for name, model in LOOKUP_MODELS.items()}
+            if timeout:
+                cache.set(key, tables, timeout)
+        return tables
+
+    def _refresh(self):
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._tables = self._load(version)
+                self._by_pk = {
+                    name: {row.pk: row for row in rows} for name, rows in self._tables.items()
+                }
+                self._memo = {}
+                self._version = version
+            return self._version, self._tables, self._by_pk, self._memo
+
+    def tables(self):
+        """{name: [rows ordered by pk]} for every lookup table."""
+        return self._refresh()[1]
+
+    def get(self, name, pk):
+        """The cached row of table `name` with primary key `pk`, or None."""
+        return self._refresh()[2][name].get(pk)
+
+    def memoize(self, key, build):
+        """
+        Returns (version, build(tables)), calling `build` at most once per version.
+        For data derived from the lookups, such as the serialized bootstrap payload.
+        """
+        version, tables, _, memo = self._refresh()
+        with self._lock:
+            if key not in memo:
+                memo[key] = build(tables)
+            return version, memo[key]
+
+
+lookup_cache = LookupCache()
@@ -1,6 +1,8 @@
 # apps/wire/models.py
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Prefetch
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from apps.users.models import QcUserModel
@@ -13,10 +15,135 @@ from .dir_classes.wire_device_production import *
 from .dir_classes.production_qc_settings import *
 
 from apps.marketing.models import Product
+from .workflow import get_workflow_state_machine
+
+
+# Shared rows (products, customers, lookups) embedded in an authorization's representation.
+AUTHORIZATION_SHARED_ROWS = ('product', 'customer', 'unshared_fields', 'form_name')
+
+
+def shared_row_stamps(prefix=''):
+    """
+    values() paths of every column of the shared rows an authorization embeds.
+    Those rows have no updated_at, so ETags are built from their values.
+    """
+    return [
+        f"{prefix}{name}__{field.attname}"
+        for name in AUTHORIZATION_SHARED_ROWS
+        for field in DeviceAuthorization._meta.get_field(name).related_model._meta.concrete_fields
+    ]
 
 
 # --- Master Workflow Models --------------------------------------------------
 
+class WireManufacturingProcessQuerySet(models.QuerySet):
+    """
+    Query helpers for the master process.
+    """
+    @staticmethod
+    def _detail_relations():
+        """
+        What each relation of the detail representation needs when embedded
+        ('select' / 'prefetch') and when collapsed to ids ('ids').
+        """
+        return {
+            'raw_materials': {
+                'prefetch': ['raw_materials__qc_tests_wire'],
+                'ids': [Prefetch('raw_materials', queryset=DeviceRawMaterial.objects.only('pk', 'manufacturing_process'))],
+            },
+            'authorization': {
+                'select': [
+                    'authorization__form_name',
+                    'authorization__product',
+                    'authorization__customer',
+                    'authorization__unshared_fields',
+                    'authorization__license_production',
+                    'authorization__packaging',
+                ],
+                'prefetch': ['authorization__raw_material_specifications', 'authorization__device_settings'],
+            },
+            'checklist': {'select': ['checklist'], 'prefetch': ['checklist__qc_tests_wire']},
+            'production': {
+                'select': ['production'],
+                'prefetch': ['production__production__production_qc_test', 'production__production_wastes'],
+            },
+            'product_final': {'select': ['product_final']},
+            'actions': {
+                'prefetch': [WireManufacturingProcess.prefetch_latest_actions(
+                    ManufacturingProcessAction.objects.select_related('user')
+                )],
+                'ids': [WireManufacturingProcess.prefetch_latest_actions(
+                    ManufacturingProcessAction.objects.only('pk', 'process', 'timestamp')
+                )],
+            },
+        }
+
+    def with_details(self, fields=None, expand=None):
+        """
+        Loads everything WireManufacturingProcessSerializer walks, so a detail
+        response costs a fixed number of queries regardless of how many raw
+        materials, tests, production rows or actions the process has.
+
+        `fields` and `expand` mirror the serializer's sparse fieldset options:
+        relations that are left out cost nothing, and relations that are not
+        expanded only load their ids.
+        """
+        queryset = self
+        if fields is None or 'actions_count' in fields:
+            queryset = queryset.annotate(action_total=models.Count('actions'))
+        select, prefetch = ['created_by'], []
+        for name, plan in self._detail_relations().items():
+            if fields is not None and name not in fields:
+                continue
+            if expand is None or name in expand:
+                select += plan.get('select', [])
+                prefetch += plan.get('prefetch', [])
+            else:
+                prefetch += plan.get('ids', [])
+        return queryset.select_related(*select).prefetch_related(*prefetch)
+
+    def actionable_by(self, group_names):
+        """In-flight processes whose current step is assigned to one of `group_names`."""
+        return self.filter(current_actor__in=group_names, is_completed=False)
+
+    def sync_current_actors(self, batch_size=1000):
+        """
+        Recomputes current_actor for every process in the queryset and returns
+        how many rows changed. For backfilling processes created before the
+        column existed, or after the actors in WIRE_WORKFLOW change.
+        updated_at is left alone.
+        """
+        updated = 0
+        changed = []
+        for process in self.only('pk', 'stage', 'current_step', 'is_completed', 'current_actor').iterator(batch_size):
+            previous = process.current_actor
+            if process.sync_current_actor() != previous:
+                changed.append(process)
+            if len(changed) >= batch_size:
+                updated += self.model.objects.bulk_update(changed, ['current_actor'])
+                changed = []
+        return updated + self.model.objects.bulk_update(changed, ['current_actor'])
+
+    def version_stamps(self):
+        """
+        What the detail representation depends on, without loading the tree:
+        the process's own updated_at and completion flag, each linked form's id
+        and updated_at, the raw materials' count and latest updated_at, and the
+        shared rows embedded in the authorization. One query.
+        """
+        return self.annotate(
+            raw_material_count=models.Count('raw_materials'),
+            raw_materials_updated_at=models.Max('raw_materials__updated_at'),
+        ).values(
+            'pk', 'updated_at', 'is_completed', 'raw_material_count', 'raw_materials_updated_at',
+            'authorization_id', 'authorization__updated_at',
+            'checklist_id', 'checklist__updated_at',
+            'production_id', 'production__updated_at',
+            'product_final_id', 'product_final__updated_at',
+            *shared_row_stamps('authorization__'),
+        )
+
+
 class WireManufacturingProcess(models.Model):
     """
     The master tracker for a single, complete wire manufacturing process,
@@ -38,11 +165,65 @@ class WireManufacturingProcess(models.Model):
     current_step = models.IntegerField(default=1)
     is_completed = models.BooleanField(default=False)
     is_rejected = models.BooleanField(default=False)
+    # Group required to act on the current step, denormalized from the workflow
+    # config so "what is waiting on me" is a single indexed query. Blank once completed.
+    current_actor = models.CharField(max_length=100, blank=True, default='')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(QcUserModel, on_delete=models.SET_NULL, null=True, related_name='processes_created')
 
+    objects = WireManufacturingProcessQuerySet.as_manager()
+
+    class Meta:
+        # Composite indexes backing the filtered, keyset-paginated list endpoint.
+        indexes = [
+            models.Index(fields=['-updated_at', '-id'], name='wire_proc_updated_idx'),
+            models.Index(fields=['stage', 'current_step', '-updated_at', '-id'], name='wire_proc_stage_updated_idx'),
+            models.Index(fields=['is_completed', '-updated_at', '-id'], name='wire_proc_done_updated_idx'),
+            models.Index(fields=['created_by', '-updated_at', '-id'], name='wire_proc_creator_updated_idx'),
+            models.Index(fields=['created_at'], name='wire_proc_created_idx'),
+            models.Index(fields=['current_actor', 'is_completed', '-updated_at', '-id'], name='wire_proc_actor_updated_idx'),
+        ]
+
+    # How many of the newest actions the detail representation embeds; the
+    # full history is paginated at workflow/process/<pk>/actions/.
+    latest_actions_limit = 10
+
+    @classmethod
+    def prefetch_latest_actions(cls, queryset):
+        """Prefetch of the newest `latest_actions_limit` actions per process, into `latest_actions`."""
+        return Prefetch(
+            'actions',
+            queryset=queryset.order_by('-timestamp', '-id')[:cls.latest_actions_limit],
+            to_attr='_latest_actions',
+        )
+
+    @property
+    def latest_actions(self):
+        if hasattr(self, '_latest_actions'):
+            return self._latest_actions
+        return list(self.actions.select_related('user').order_by('-timestamp', '-id')[:self.latest_actions_limit])
+
+    @property
+    def actions_count(self):
+        """Total number of actions, from the `action_total` annotation when present."""
+        total = getattr(self, 'action_total', None)
+        return self.actions.count() if total is None else total
+
+    def sync_current_actor(self):
+        """Recomputes current_actor from the stage/step; returns the new value."""
+        step = None if self.is_completed else get_workflow_state_machine().get_step(self.stage, self.current_step)
+        self.current_actor = step.actor_permission if step else ''
+        return self.current_actor
+
+    def save(self, *args, **kwargs):
+        self.sync_current_actor()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'stage', 'current_step', 'is_completed'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'current_actor'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Process #{self.id} - Stage: {self.stage}, Step: {self.current_step}"
 
@@ -61,6 +242,12 @@ class ManufacturingProcessAction(models.Model):
     comment = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-process history, newest first (workflow/process/<pk>/actions/).
+            models.Index(fields=['process', '-timestamp', '-id'], name='wire_action_process_ts_idx'),
+        ]
+
     def __str__(self):
         return f"Action by {self.user} on Process #{self.process.id} at {self.timestamp}"
 
@@ -79,3 +266,81 @@ class DeviceProduct(FormSpecifications):
 
     def __str__(self):
         return f"Device Product - {self.document_code}"
+
+
+# --- Idempotency --------------------------------------------------
+class IdempotencyRecord(models.Model):
+    """
+    The first response to a request sent with an `Idempotency-Key` header, so a
+    retried request can be answered without running it again (see idempotency.py).
+    Rows expire after WIRE_IDEMPOTENCY_TTL seconds and are purged on write.
+    """
+    user = models.ForeignKey(QcUserModel, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # "<METHOD> <path>" and a hash of the parsed payload, to reject key reuse for a different request.
+    scope = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request is still being processed.
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user')
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} ({self.scope})"
+
+
+# --- Cross-form search --------------------------------------------
+class WireFormSearchEntry(models.Model):
+    """
+    The lookup codes of one workflow form (or authorization raw material spec),
+    so paperwork can be found across every form table with a single indexed
+    prefix query. Kept current by signals.py; see search.py.
+    """
+    # model_name of the indexed row, e.g. 'devicerawmaterial'.
+    form_type = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    # The codes as entered, for display.
+    document_code = models.CharField(max_length=255, blank=True, default='')
+    trace_code = models.CharField(max_length=255, blank=True, default='')
+    license_number = models.CharField(max_length=255, blank=True, default='')
+    # Lowercased copies that searches match on.
+    document_code_key = models.CharField(max_length=255, blank=True, default='')
+    trace_code_key = models.CharField(max_length=255, blank=True, default='')
+    license_number_key = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['form_type', 'object_id'], name='unique_wire_search_entry')
+        ]
+        # pattern_ops lets PostgreSQL answer LIKE 'prefix%' from the index (ignored elsewhere).
+        indexes = [
+            models.Index(fields=['trace_code_key'], name='wire_search_trace_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['document_code_key'], name='wire_search_document_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['license_number_key'], name='wire_search_license_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.form_type} #{self.object_id}"
+
+
+# --- Completed process snapshots ----------------------------------
+class WireProcessSnapshot(models.Model):
+    """
+    The rendered detail JSON of a completed process, gzip-compressed, so reads
+    of a frozen tree skip the ORM object graph (see snapshots.py). `etag` is the
+    detail ETag the body was built for. The ETag covers the tree's own rows and
+    the shared rows it embeds (lookups, products, customers), so a superuser
+    edit to either rebuilds the snapshot on the next read.
+    """
+    process = models.OneToOneField(WireManufacturingProcess, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    etag = models.CharField(max_length=64)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot of Process #{self.process_id}"
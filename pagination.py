@@ -1,6 +1,8 @@
 # apps/wire/pagination.py
+import json
 
-from rest_framework.pagination import PageNumberPagination
+from django.db import connections
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 
 class CustomPagination(PageNumberPagination):
     """
@@ -13,3 +15,124 @@ class CustomPagination(PageNumberPagination):
     
     # The maximum page size that can be requested.
     max_page_size = 100
+
+
+def estimate_count(queryset):
+    """
+    Row estimate for `queryset` from the PostgreSQL planner (EXPLAIN), which
+    costs no table scan. Other databases fall back to an exact COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class WireCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, newest first. No COUNT(*) and no
+    OFFSET, so deep pages cost the same as the first one.
+    Send ?count=approximate to add a planner-estimated 'approximate_count'.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approximate':
+            self.approximate_count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.approximate_count is not None:
+            response.data['approximate_count'] = self.approximate_count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['approximate_count'] = {'type': 'integer', 'example': 1200}
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': "Set to 'approximate' to include an estimated total.",
+            'schema': {'type': 'string', 'enum': ['approximate']},
+        }]
+
+
+class ProcessCursorPagination(WireCursorPagination):
+    """
+    Keyset pagination for master processes, newest activity first.
+    Avoids COUNT(*) and OFFSET scans so deep pages stay as cheap as the first.
+    """
+    page_size = 50
+    max_page_size = 200
+    ordering = ('-updated_at', '-id')
+
+
+class ProcessActionCursorPagination(WireCursorPagination):
+    """
+    Keyset pagination over one process's action history, newest first.
+    Backed by the (process, -timestamp, -id) index on ManufacturingProcessAction.
+    """
+    page_size = 50
+    max_page_size = 200
+    ordering = ('-timestamp', '-id')
+
+
+class SelectablePagination:
+    """
+    Page numbers (CustomPagination) by default; ?pagination=cursor switches the
+    request to WireCursorPagination. Cursor links keep the parameter, so
+    following 'next' stays in cursor mode.
+    """
+    query_param = 'pagination'
+    page_number_class = CustomPagination
+    cursor_class = WireCursorPagination
+
+    def __init__(self):
+        self.page_number = self.page_number_class()
+        self.cursor = self.cursor_class()
+        self.active = self.page_number
+
+    def paginate_queryset(self, queryset, request, view=None):
+        use_cursor = request.query_params.get(self.query_param) == 'cursor'
+        self.active = self.cursor if use_cursor else self.page_number
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.query_param,
+            'required': False,
+            'in': 'query',
+            'description': "Set to 'cursor' for keyset pagination without a total count.",
+            'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+        }] + self.page_number.get_schema_operation_parameters(view) + [
+            param for param in self.cursor.get_schema_operation_parameters(view)
+            if param['name'] != self.cursor.page_size_query_param
+        ]
+
+    def __getattr__(self, name):
+        # Browsable API hooks (to_html, display_page_controls, ...) follow the active paginator.
+        if name == 'active':
+            raise AttributeError(name)
+        return getattr(self.active, name)
@@ -1,7 +1,8 @@
 # apps/wire/permissions.py
 from rest_framework.permissions import BasePermission
-from .models import WireManufacturingProcess, DeviceRawMaterial, DeviceChecklist, DeviceProduction, DeviceProduct
-from .workflow import WIRE_WORKFLOW
+from .models import WireManufacturingProcess
+from .workflow import get_workflow_state_machine
+from .authorization import WireAuthorizationContext
 
 class IsSuperUser(BasePermission):
     """
@@ -16,14 +17,10 @@ class WireObjectPermissionBase(BasePermission):
     """
     def get_workflow_request(self, obj):
         """Finds the active master workflow process for a given form object."""
-        # For DeviceRawMaterial, the link is now a direct ForeignKey
-        if isinstance(obj, DeviceRawMaterial):
-            return obj.manufacturing_process
-            
+        # DeviceRawMaterial links via a ForeignKey, the other forms via the reverse
+        # side of a OneToOneField; both are exposed as `manufacturing_process`.
         try:
-            # For other models, find the process via the OneToOneField
-            query_filter = {f"{obj._meta.model_name}__pk": obj.pk}
-            return WireManufacturingProcess.objects.get(**query_filter)
+            return obj.manufacturing_process
         except WireManufacturingProcess.DoesNotExist:
             return None
 
@@ -31,16 +28,13 @@ class WireObjectPermissionBase(BasePermission):
         """Gets the configuration for the current step from workflow.py."""
         if not workflow_request or workflow_request.is_completed:
             return None
-        stage_config = WIRE_WORKFLOW.get(workflow_request.stage)
-        if not stage_config:
-            return None
-        return next((step for step in stage_config['steps'] if step['step'] == workflow_request.current_step), None)
+        return get_workflow_state_machine().get_step(workflow_request.stage, workflow_request.current_step)
 
-    def has_group_permission(self, user, required_group):
+    def has_group_permission(self, auth, required_group):
         """Checks if a user is in the required group or is a superuser."""
         if not required_group:
             return False
-        return user.groups.filter(name=required_group).exists() or user.is_superuser
+        return auth.can_act_as(required_group)
 
 class CanCreateFormForStage(BasePermission):
     """
@@ -74,13 +68,16 @@ class CanCreateFormForStage(BasePermission):
         
         stage_name, model_field = stage_to_field_map.get(model_name, (None, None))
         view.stage_name = model_field  # Pass field name to the view for linking
+        view.workflow_process = process  # Reused by the serializer instead of re-fetching
 
         if not stage_name:
             self.message = "Internal configuration error: This form is not part of the master workflow."
             return False
         
+        auth = WireAuthorizationContext.for_request(request)
+
         # Special rule for initial forms
-        if stage_name in ['rawmaterial', 'license'] and not request.user.groups.filter(name='QC').exists() and not request.user.is_superuser:
+        if stage_name in ['rawmaterial', 'license'] and not auth.can_act_as('QC'):
             self.message = "Only users in the 'QC' group can create Raw Material and Authorization forms."
             return False
 
@@ -94,15 +91,14 @@ class CanCreateFormForStage(BasePermission):
                 self.message = f"A {model_name} form has already been created for this workflow."
                 return False
             
-        stage_config = WIRE_WORKFLOW.get(process.stage, {})
-        step_config = next((s for s in stage_config.get('steps', []) if s['step'] == process.current_step), None)
+        step_config = get_workflow_state_machine().get_step(process.stage, process.current_step)
 
         if not step_config:
              self.message = "Workflow step configuration not found."
              return False
         
-        required_group = step_config.get('actor_permission')
-        if not request.user.groups.filter(name=required_group).exists() and not request.user.is_superuser:
+        required_group = step_config.actor_permission
+        if not auth.can_act_as(required_group):
             self.message = f"You are not in the required group ('{required_group}') to create this form for the current step."
             return False
 
@@ -121,62 +117,35 @@ class CanUpdateFormForStage(WireObjectPermissionBase):
         if not step_config:
             return False
         
-        required_group = step_config.get('actor_permission')
-        if not self.has_group_permission(request.user, required_group):
+        auth = WireAuthorizationContext.for_request(request)
+        required_group = step_config.actor_permission
+        if not self.has_group_permission(auth, required_group):
             self.message = f"Your group is not authorized to perform actions at this step."
             return False
 
         # --- Granular Field-Level Security Logic ---
-        user_group_name = request.user.groups.first().name if request.user.groups.exists() else None
-        incoming_data = request.data.keys()
-        action_details = step_config.get('details', {})
-
-        # CHECKLIST STAGE
-        if isinstance(obj, DeviceChecklist):
-            if user_group_name == 'QC':
-                # QC can edit anything EXCEPT operator_approval in the nested tests
-                if 'qc_tests_wire' in incoming_data:
-                    for test_data in request.data.get('qc_tests_wire', []):
-                        if 'operator_approval' in test_data:
-                            self.message = "QC users cannot change the 'operator_approval' field."
-                            return False
-            elif user_group_name == 'OP':
-                # Operator can ONLY edit operator_approval in nested tests
-                allowed_keys = {'qc_tests_wire'}
-                if not set(incoming_data).issubset(allowed_keys):
-                    self.message = "Operators can only modify 'qc_tests_wire' data."
-                    return False
-                for test_data in request.data.get('qc_tests_wire', []):
-                    allowed_nested_keys = {'id', 'operator_approval'}
-                    if not set(test_data.keys()).issubset(allowed_nested_keys):
-                        self.message = "Operators can only submit 'id' and 'operator_approval' for a test."
-                        return False
-
-        # PRODUCTION STAGE
-        elif isinstance(obj, DeviceProduction):
-            action = step_config.get('action')
-            if user_group_name == 'QC' and action == "Fill out 'FormSpecifications' for production.":
-                allowed = {'document_code', 'license_number', 'trace_date', 'trace_code', 'description'}
-                if not set(incoming_data).issubset(allowed):
-                    self.message = "At this step, QC can only fill out Form Specification fields."
-                    return False
-            elif user_group_name == 'OP' and action == "Fill production data fields.":
-                allowed = {'production'}
-                allowed_nested = set(action_details.get('fields', [])) | {'id'}
-                if not set(incoming_data).issubset(allowed):
-                    self.message = "At this step, Operators can only submit production data."
-                    return False
-                for prod_item in request.data.get('production', []):
-                    if not set(prod_item.keys()).issubset(allowed_nested):
-                        self.message = f"Invalid fields submitted for production data. Allowed: {list(allowed_nested)}"
-                        return False
-            # Add other production stage rules here...
-
-        # PRODUCT STAGE
-        elif isinstance(obj, DeviceProduct):
-            if user_group_name != 'QC' and not request.user.is_superuser:
-                self.message = "Only QC users can create or edit the final product form."
+        # Rules live in workflow.WIRE_FIELD_POLICIES, compiled into key sets.
+        policy = get_workflow_state_machine().get_field_policy(
+            obj._meta.model_name, process.stage, process.current_step,
+            auth.primary_group, is_superuser=auth.is_superuser,
+        )
+        return self.check_field_policy(request, view, policy)
+
+    def check_field_policy(self, request, view, policy):
+        """Applies the field policy (None = unrestricted) to the request payload."""
+        if policy:
+            error = policy.check(request.data)
+            if error:
+                self.message = error
                 return False
-                
         return True
 
+class CanImportProductionRows(CanUpdateFormForStage):
+    """
+    The workflow checks of CanUpdateFormForStage for streamed production row imports.
+    The body is not parsed here; the field policy is handed to the view, which
+    applies it to each row as it is read.
+    """
+    def check_field_policy(self, request, view, policy):
+        view.field_policy = policy
+        return True
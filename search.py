@@ -0,0 +1,109 @@
+# apps/wire/search.py
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, When
+
+from .models import (
+    DeviceRawMaterial, DeviceAuthorization, DeviceChecklist, DeviceProduction, DeviceProduct,
+    RawMaterialSpecifications, WireManufacturingProcess, WireFormSearchEntry,
+)
+
+SEARCH_FIELDS = ('document_code', 'trace_code', 'license_number')
+
+# Rows that carry lookup codes. Each is indexed under its model_name.
+SEARCHABLE_MODELS = (
+    DeviceRawMaterial, DeviceAuthorization, DeviceChecklist, DeviceProduction, DeviceProduct,
+    RawMaterialSpecifications,
+)
+
+
+def _normalize(value):
+    return (value or '').strip().lower()
+
+
+def _key(field):
+    """The normalized column that `field` is matched on."""
+    return f"{field}_key"
+
+
+# Columns written on every upsert: the codes as entered, and their match keys.
+ENTRY_FIELDS = SEARCH_FIELDS + tuple(_key(field) for field in SEARCH_FIELDS)
+
+
+def build_entry(instance):
+    values = {field: (getattr(instance, field, None) or '').strip() for field in SEARCH_FIELDS}
+    return WireFormSearchEntry(
+        form_type=instance._meta.model_name,
+        object_id=instance.pk,
+        **values,
+        **{_key(field): value.lower() for field, value in values.items()},
+    )
+
+
+def index_forms(instances):
+    """
+    Upserts search entries for `instances` in one query. Saves are indexed by
+    signals; call this after bulk_create, which sends none.
+    """
+    entries = [build_entry(instance) for instance in instances]
+    if entries:
+        WireFormSearchEntry.objects.bulk_create(
+            entries, update_conflicts=True,
+            unique_fields=['form_type', 'object_id'], update_fields=list(ENTRY_FIELDS),
+        )
+
+
+def unindex_form(instance):
+    WireFormSearchEntry.objects.filter(form_type=instance._meta.model_name, object_id=instance.pk).delete()
+
+
+def rebuild_search_index(batch_size=1000):
+    """Indexes every searchable row; for backfilling an existing database."""
+    for model in SEARCHABLE_MODELS:
+        batch = []
+        for instance in model.objects.only('pk', *[f for f in SEARCH_FIELDS if hasattr(model, f)]).iterator(batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                index_forms(batch)
+                batch = []
+        index_forms(batch)
+
+
+def _owning_process():
+    """
+    The process each entry belongs to, resolved in SQL so it never goes stale
+    when forms are linked to or unlinked from a process. Each branch is a
+    unique-key lookup, evaluated only for matching rows.
+    """
+    def process_with(**lookup):
+        return Subquery(WireManufacturingProcess.objects.filter(**lookup).values('pk')[:1])
+
+    object_id = OuterRef('object_id')
+    return Case(
+        When(form_type='devicerawmaterial', then=Subquery(
+            DeviceRawMaterial.objects.filter(pk=object_id).values('manufacturing_process_id')[:1]
+        )),
+        When(form_type='deviceauthorization', then=process_with(authorization_id=object_id)),
+        When(form_type='devicechecklist', then=process_with(checklist_id=object_id)),
+        When(form_type='deviceproduction', then=process_with(production_id=object_id)),
+        When(form_type='deviceproduct', then=process_with(product_final_id=object_id)),
+        When(form_type='rawmaterialspecifications', then=process_with(authorization__raw_material_specifications=object_id)),
+        output_field=IntegerField(),
+    )
+
+
+def search_forms(term, limit=50):
+    """
+    Entries whose document_code, trace_code or license_number starts with
+    `term` (case-insensitive), with the codes as entered and the owning
+    process id as 'workflow_id'.
+    Runs as a single query.
+    """
+    term = _normalize(term)
+    match = Q()
+    for field in SEARCH_FIELDS:
+        match |= Q(**{f"{_key(field)}__startswith": term})
+    return (
+        WireFormSearchEntry.objects.filter(match)
+        .annotate(workflow_id=_owning_process())
+        .order_by('form_type', 'object_id')
+        .values('form_type', 'object_id', 'workflow_id', *SEARCH_FIELDS)[:limit]
+    )
@@ -1,5 +1,10 @@
 # apps/wire/serializers.py
+from typing import NamedTuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from apps.wire.models import (
     DeviceRawMaterial, DeviceAuthorization, DeviceChecklist,
     DeviceProduction, DeviceProduct, LicenseProduction,
@@ -20,71 +25,169 @@ from .dir_classes.production_qc_settings import (
     ProductionExtruderQcTestWire, ProductionRadiantQcTestWire,
     ProductionFiberWeaverQcTestWire, ProductionShieldWeaverQcTestWire
 )
+from .search import index_forms
+from .lookups import LOOKUP_MODELS, lookup_cache
+from .fragments import fragment_cache
 from apps.marketing.serializers import ProductSerializer, CustomerSerializer
 from apps.marketing.models import Product, Customer
 
+# --- Sparse fieldsets ---
+
+def _collapsed_pk():
+    return serializers.PrimaryKeyRelatedField(read_only=True)
+
+def _collapsed_pks():
+    return serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+class SparseFieldsetMixin:
+    """
+    Read-side options for lightweight callers, passed as serializer kwargs:
+
+    - `fields`: names to include; everything else is left out.
+    - `expand`: which `expandable_fields` to embed. The rest are rendered by
+      their collapsed (id) field. None embeds all of them, as before.
+
+    Left-out and collapsed nested serializers are never instantiated.
+    """
+    # name -> factory for the field rendered when the relation is not expanded
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.only_fields = set(fields) if fields is not None else None
+        self.expand = set(expand) if expand is not None else None
+        super().__init__(*args, **kwargs)
+
+    def wants(self, name):
+        return self.only_fields is None or name in self.only_fields
+
+    def is_expanded(self, name):
+        return self.expand is None or name in self.expand
+
+    def get_fields(self):
+        if self.only_fields is None and self.expand is None:
+            return super().get_fields()
+        declared = {}
+        for name, field in self._declared_fields.items():
+            if not self.wants(name):
+                continue
+            if name in self.expandable_fields and not self.is_expanded(name):
+                field = self.expandable_fields[name]()
+            declared[name] = field
+        # Shadow the class attribute for this instance only while the fields are built.
+        self._declared_fields = declared
+        try:
+            return super().get_fields()
+        finally:
+            del self._declared_fields
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        return [name for name in names if self.wants(name)]
+
 # --- Base Serializers for Workflow Forms ---
 
-class BaseWorkflowFormSerializer(serializers.ModelSerializer):
+class WorkflowProcessMixin:
+    """Resolves the `workflow_id` of a create payload to its master process."""
+    def _get_process(self, workflow_id):
+        # CanCreateFormForStage has already loaded the process for this request.
+        view = self.context.get('view')
+        process = getattr(view, 'workflow_process', None)
+        if process is not None and process.pk == workflow_id:
+            return process
+        try:
+            return WireManufacturingProcess.objects.get(pk=workflow_id)
+        except WireManufacturingProcess.DoesNotExist:
+            raise serializers.ValidationError(f"Workflow with id {workflow_id} not found.")
+
+
+class BaseWorkflowFormSerializer(WorkflowProcessMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Base serializer that includes the 'workflow_id' field, which is required
     for creation but is not part of the models themselves.
     """
     workflow_id = serializers.IntegerField(write_only=True, required=True, help_text="The ID of the master manufacturing process.")
 
+    # Relations read by to_representation. The form viewsets load them up front
+    # (see setup_eager_loading) so a page costs a fixed number of queries.
+    select_related_fields = ('manufacturing_process',)
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None):
+        """Applies the plan, skipping relations that `fields` leaves out or `expand` collapses."""
+        def needed(lookup):
+            root = lookup.split('__')[0]
+            if root == 'manufacturing_process':
+                return fields is None or bool({'stage', 'current_step', 'workflow_id'} & set(fields))
+            if fields is not None and root not in fields:
+                return False
+            return expand is None or root not in cls.expandable_fields or root in expand
+
+        return queryset.select_related(
+            *filter(needed, cls.select_related_fields)
+        ).prefetch_related(*filter(needed, cls.prefetch_related_fields))
+
+    def build_relational_field(self, field_name, relation_info):
+        # Form names come from the lookup cache rather than one query per form.
+        if relation_info.related_model is WireFormName and not relation_info.to_many:
+            _, field_kwargs = super().build_relational_field(field_name, relation_info)
+            field_kwargs.pop('queryset', None)
+            return CachedWireFormNameField, field_kwargs
+        return super().build_relational_field(field_name, relation_info)
+
     def get_fields(self, *args, **kwargs):
         fields = super().get_fields(*args, **kwargs)
         # Make workflow_id not required for updates (PATCH/PUT)
-        if self.instance is not None:
+        if self.instance is not None and 'workflow_id' in fields:
             fields['workflow_id'].required = False
         return fields
 
     def to_representation(self, instance):
+        # Full representations are reused across requests until the form changes.
+        if self.only_fields is None and self.expand is None:
+            return fragment_cache.get_or_render(self, instance, lambda: self._render(instance))
+        return self._render(instance)
+
+    def _render(self, instance):
         representation = super().to_representation(instance)
+        if not self.wants('workflow_id'):
+            return representation
         workflow_id = None
         if hasattr(instance, 'manufacturing_process') and instance.manufacturing_process:
             workflow_id = instance.manufacturing_process.id
         representation['workflow_id'] = workflow_id
         return representation
 
+    # Field on WireManufacturingProcess that points at each one-to-one form.
+    process_field_map = {
+        'deviceauthorization': 'authorization',
+        'devicechecklist': 'checklist',
+        'deviceproduction': 'production',
+        'deviceproduct': 'product_final',
+    }
+
+    @transaction.atomic
     def create(self, validated_data):
         # Pop the 'workflow_id' to prevent it from being passed to the model constructor,
         # where it would cause a TypeError.
         workflow_id = validated_data.pop('workflow_id')
+        process = self._get_process(workflow_id)
+
+        # DeviceRawMaterial is one-to-many: the link is part of its own INSERT.
+        if self.Meta.model is DeviceRawMaterial:
+            validated_data['manufacturing_process'] = process
+            return super().create(validated_data)
 
         # Create the form instance (e.g., DeviceAuthorization) with the remaining clean data.
         instance = super().create(validated_data)
 
-        # Now, link the newly created instance to its master workflow process.
-        model_name = self.Meta.model._meta.model_name.lower()
-        
-        try:
-            process = WireManufacturingProcess.objects.get(pk=workflow_id)
+        # Link it to the master process with a narrow UPDATE. Assigning the
+        # one-to-one also fills instance.manufacturing_process, so no refresh is needed.
+        model_field_name = self.process_field_map.get(self.Meta.model._meta.model_name)
+        if model_field_name:
+            setattr(process, model_field_name, instance)
+            process.save(update_fields=[model_field_name, 'updated_at'])
 
-            # Handle the one-to-many relationship for DeviceRawMaterial
-            if isinstance(instance, DeviceRawMaterial):
-                instance.manufacturing_process = process
-                instance.save()
-            
-            # Handle one-to-one relationships for all other models
-            else:
-                model_field_map = {
-                    'deviceauthorization': 'authorization',
-                    'devicechecklist': 'checklist',
-                    'deviceproduction': 'production',
-                    'deviceproduct': 'product_final',
-                }
-                model_field_name = model_field_map.get(model_name)
-                
-                if model_field_name and hasattr(process, model_field_name):
-                    setattr(process, model_field_name, instance)
-                    process.save()
-
-            # Refresh the instance from the database to reflect the new relationship.
-            instance.refresh_from_db()
-        except WireManufacturingProcess.DoesNotExist:
-            raise serializers.ValidationError(f"Workflow with id {workflow_id} not found.")
-        
         return instance
 
 # ----------------------------------------------------------------------------
@@ -115,17 +218,7 @@ class DeviceSettingsRelatedField(serializers.RelatedField):
     def to_representation(self, value):
         if value is None:
             return None
-            
-        if isinstance(value, FormExtruderSettings): 
-            return FormExtruderSettingsSerializer(value).data
-        if isinstance(value, FormFiberWeaverSettings): 
-            return FormFiberWeaverSettingsSerializer(value).data
-        if isinstance(value, FormRadiantSettings): 
-            return FormRadiantSettingsSerializer(value).data
-        if isinstance(value, FormShieldWeaverSettings): 
-            return FormShieldWeaverSettingsSerializer(value).data
-        
-        raise Exception('Unexpected type of settings object')
+        return device_types.for_model(value).settings_serializer(value).data
 
 # --- Lookups & Helper Serializers ---
 
@@ -133,6 +226,37 @@ class WireFormNameField(serializers.PrimaryKeyRelatedField):
     def to_representation(self, value):
         return value.name if value else None
 
+class CachedLookupRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that resolves ids from the lookup cache instead of querying.
+    Ids the cache does not know are looked up in the database before being
+    rejected, since a row added through another worker may not have reached this
+    worker's copy yet.
+    """
+    lookup_name = None  # key in lookups.LOOKUP_MODELS
+
+    def __init__(self, **kwargs):
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', LOOKUP_MODELS[self.lookup_name].objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = lookup_cache.get(self.lookup_name, pk)
+        if instance is None:
+            instance = self.get_queryset().filter(pk=pk).first()
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+class CachedWireFormNameField(CachedLookupRelatedField):
+    lookup_name = 'wire_form_names'
+
 class UnsharedFieldStructureSerializer(serializers.ModelSerializer):
     class Meta:
         model = UnsharedFieldStructure
@@ -160,37 +284,89 @@ class WireFormNameSerializer(serializers.ModelSerializer):
 
 
 class QcTestWireSerializer(serializers.ModelSerializer):
+    # Writable so nested updates can match incoming tests to existing rows.
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = QcTestWire
         exclude = ['content_type', 'object_id']
 
 
+def _assign_changed(instance, data):
+    """Sets the values in `data` that differ from `instance`; returns the changed field names."""
+    changed = []
+    for attr, value in data.items():
+        field = instance._meta.get_field(attr)
+        if field.is_relation:
+            # Compare ids so unchanged foreign keys don't trigger a fetch.
+            current, new = getattr(instance, field.attname), getattr(value, 'pk', value)
+        else:
+            current, new = getattr(instance, attr), value
+        if current != new:
+            setattr(instance, attr, value)
+            changed.append(attr)
+    return changed
+
+
+def _without_id(data):
+    return {key: value for key, value in data.items() if key != 'id'}
+
+
+def _sync_nested(existing, items_data, build):
+    """
+    Id-keyed upsert of a nested list: items with a known 'id' update that row
+    (changed fields only), items without one are created via `build(data)`, and
+    rows in `existing` (a queryset scoped to the parent) that are not referenced
+    are deleted. Costs one read plus at most one delete, one bulk_update and
+    one bulk_create; call inside a transaction.
+    """
+    model = existing.model
+    current = {obj.pk: obj for obj in existing}
+    to_create, to_update, changed_fields, kept_ids = [], [], set(), set()
+
+    for item_data in items_data:
+        item_data = dict(item_data)
+        obj = current.get(item_data.pop('id', None))
+        if obj is None:
+            to_create.append(build(item_data))
+            continue
+        kept_ids.add(obj.pk)
+        changed = _assign_changed(obj, item_data)
+        if changed:
+            to_update.append(obj)
+            changed_fields.update(changed)
+
+    stale_ids = current.keys() - kept_ids
+    if stale_ids:
+        existing.filter(pk__in=stale_ids).delete()
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(changed_fields))
+    if to_create:
+        model.objects.bulk_create(to_create)
+
+
 class QcTestWireableModelSerializerMixin:
     """Mixin for handling nested qc_tests_wire for creation and updates."""
     def _handle_qc_tests(self, instance, qc_tests_data):
+        """
+        Syncs the instance's tests with `qc_tests_data` as a diff (see _sync_nested),
+        so the query count does not depend on how many tests there are.
+        """
         if qc_tests_data is None:
             return
-            
-        if self.instance is None:
-             for test_data in qc_tests_data:
-                QcTestWire.objects.create(content_object=instance, **test_data)
-             return
-
-        existing_test_ids = {test.id for test in instance.qc_tests_wire.all()}
-        incoming_test_ids = {test.get('id') for test in qc_tests_data if test.get('id')}
-
-        for test_data in qc_tests_data:
-            test_id = test_data.pop('id', None)
-            if test_id in existing_test_ids:
-                test_instance = QcTestWire.objects.get(id=test_id, object_id=instance.id)
-                for attr, value in test_data.items():
-                    setattr(test_instance, attr, value)
-                test_instance.save()
-            else:
-                QcTestWire.objects.create(content_object=instance, **test_data)
-        
-        for test_id in existing_test_ids - incoming_test_ids:
-            QcTestWire.objects.filter(id=test_id, object_id=instance.id).delete()
+
+        content_type = ContentType.objects.get_for_model(instance)
+
+        def build(test_data):
+            # Client-sent ids only address existing rows; new tests get their own keys.
+            return QcTestWire(content_type=content_type, object_id=instance.pk, **_without_id(test_data))
+
+        with transaction.atomic():
+            if self.instance is None:
+                QcTestWire.objects.bulk_create([build(test_data) for test_data in qc_tests_data])
+                return
+            scoped = QcTestWire.objects.filter(content_type=content_type, object_id=instance.pk)
+            _sync_nested(scoped, qc_tests_data, build)
 
     def update(self, instance, validated_data):
         qc_tests_data = validated_data.pop('qc_tests_wire', None)
@@ -240,21 +416,59 @@ class ProductionQcTestWireRelatedField(serializers.RelatedField):
     A custom field to handle the generic relationship for production QC tests.
     """
     def to_representation(self, value):
-        if isinstance(value, ProductionExtruderQcTestWire):
-            return ProductionExtruderQcTestWireSerializer(value).data
-        
-        if isinstance(value, ProductionRadiantQcTestWire):
-            return ProductionRadiantQcTestWireSerializer(value).data
-        
-        if isinstance(value, ProductionFiberWeaverQcTestWire):
-            return ProductionFiberWeaverQcTestWireSerializer(value).data
-        
-        if isinstance(value, ProductionShieldWeaverQcTestWire):
-            return ProductionShieldWeaverQcTestWireSerializer(value).data
-        
-        raise Exception('Unexpected type of QC test object')
+        return device_types.for_model(value).qc_serializer(value).data
+
+# --- Device Type Registry ---
+
+class DeviceType(NamedTuple):
+    """Everything tied to one device: its settings and production QC models and serializers."""
+    name: str
+    settings_model: type
+    settings_serializer: type
+    qc_model: type
+    qc_serializer: type
+
+
+class DeviceTypeRegistry:
+    """
+    Maps device names (WireFormName.name) and model classes to their
+    DeviceType, replacing isinstance/string chains with dict lookups.
+    """
+    def __init__(self, types):
+        self.types = tuple(types)
+        self._by_name = {t.name: t for t in self.types}
+        self._by_model = {}
+        for t in self.types:
+            self._by_model[t.settings_model] = t
+            self._by_model[t.qc_model] = t
+
+    def by_name(self, name):
+        """Returns the DeviceType for a form name, or None for unknown names."""
+        return self._by_name.get(name)
+
+    def for_model(self, model_or_instance):
+        model = model_or_instance if isinstance(model_or_instance, type) else type(model_or_instance)
+        try:
+            return self._by_model[model._meta.concrete_model]
+        except KeyError:
+            raise TypeError(f"Unexpected device settings/QC type: {model.__name__}")
+
+
+device_types = DeviceTypeRegistry([
+    DeviceType('Extruder', FormExtruderSettings, FormExtruderSettingsSerializer,
+               ProductionExtruderQcTestWire, ProductionExtruderQcTestWireSerializer),
+    DeviceType('Radiant', FormRadiantSettings, FormRadiantSettingsSerializer,
+               ProductionRadiantQcTestWire, ProductionRadiantQcTestWireSerializer),
+    DeviceType('FiberWeaver', FormFiberWeaverSettings, FormFiberWeaverSettingsSerializer,
+               ProductionFiberWeaverQcTestWire, ProductionFiberWeaverQcTestWireSerializer),
+    DeviceType('ShieldWeaver', FormShieldWeaverSettings, FormShieldWeaverSettingsSerializer,
+               ProductionShieldWeaverQcTestWire, ProductionShieldWeaverQcTestWireSerializer),
+])
+
 
 class ProductionSerializer(serializers.ModelSerializer):
+    # Writable so nested updates can address existing rows by id.
+    id = serializers.IntegerField(required=False)
     production_qc_test = ProductionQcTestWireRelatedField(read_only=True)
     
     class Meta:
@@ -265,9 +479,11 @@ class ProductionSerializer(serializers.ModelSerializer):
 # --------------------
 
 class ProductionWasteSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = ProductionWaste
-        exclude = ['id', 'device_production']
+        exclude = ['device_production']
 
 # --- Main Form Serializers ---
 
@@ -295,10 +511,23 @@ class DeviceAuthorizationSerializer(BaseWorkflowFormSerializer):
     unshared_fields_id = serializers.PrimaryKeyRelatedField(
         queryset=UnsharedFieldStructure.objects.all(), source='unshared_fields', write_only=True, required=False, allow_null=True
     )
-    form_name_id = serializers.PrimaryKeyRelatedField(
-        queryset=WireFormName.objects.all(), source='form_name', write_only=True, required=False, allow_null=True
+    form_name_id = CachedWireFormNameField(
+        source='form_name', write_only=True, required=False, allow_null=True
     )
     
+    expandable_fields = {
+        'product': _collapsed_pk,
+        'customer': _collapsed_pk,
+        'unshared_fields': _collapsed_pk,
+        'form_name': _collapsed_pk,
+    }
+
+    select_related_fields = (
+        'manufacturing_process', 'product', 'customer', 'unshared_fields', 'form_name',
+        'license_production', 'packaging',
+    )
+    prefetch_related_fields = ('raw_material_specifications', 'device_settings')
+
     class Meta:
         model = DeviceAuthorization
         fields = [
@@ -314,6 +543,7 @@ class DeviceAuthorizationSerializer(BaseWorkflowFormSerializer):
             'settings_object_id': {'write_only': True},
         }
 
+    @transaction.atomic
     def create(self, validated_data):
         # Handle nested objects
         license_data = validated_data.pop('license_production', None)
@@ -328,8 +558,10 @@ class DeviceAuthorizationSerializer(BaseWorkflowFormSerializer):
             LicenseProduction.objects.create(authorization=instance, **license_data)
         if packaging_data: 
             Packaging.objects.create(authorization=instance, **packaging_data)
-        for spec in specs_data: 
-            RawMaterialSpecifications.objects.create(authorization=instance, **spec)
+        specs = RawMaterialSpecifications.objects.bulk_create([
+            RawMaterialSpecifications(authorization=instance, **spec) for spec in specs_data
+        ])
+        index_forms(specs)  # bulk_create sends no post_save
         
         return instance
 
@@ -359,6 +591,8 @@ class DeviceRawMaterialSerializer(QcTestWireableModelSerializerMixin, BaseWorkfl
     stage = serializers.ReadOnlyField(source='manufacturing_process.stage', read_only=True)
     current_step = serializers.ReadOnlyField(source='manufacturing_process.current_step', read_only=True)
     
+    prefetch_related_fields = ('qc_tests_wire',)
+
     class Meta:
         model = DeviceRawMaterial
         fields = '__all__'
@@ -374,11 +608,62 @@ class DeviceRawMaterialSerializer(QcTestWireableModelSerializerMixin, BaseWorkfl
         self._handle_qc_tests(instance, qc_tests_data)
         return instance
 
+class DeviceRawMaterialBatchItemSerializer(DeviceRawMaterialSerializer):
+    """One form inside a batch; the workflow comes from the enclosing payload."""
+    def get_fields(self, *args, **kwargs):
+        fields = super().get_fields(*args, **kwargs)
+        # Every form is linked to the process named by the enclosing payload.
+        fields.pop('workflow_id')
+        fields.pop('manufacturing_process')
+        # trace_code uniqueness is checked for the whole batch in one query.
+        fields['trace_code'].validators = [
+            v for v in fields['trace_code'].validators if not isinstance(v, UniqueValidator)
+        ]
+        return fields
+
+class DeviceRawMaterialBatchSerializer(WorkflowProcessMixin, serializers.Serializer):
+    """
+    Creates several raw material forms, with their QC tests, for one process.
+    Forms and tests are written with one bulk_create each.
+    """
+    workflow_id = serializers.IntegerField(write_only=True, help_text="The ID of the master manufacturing process.")
+    forms = DeviceRawMaterialBatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_forms(self, forms):
+        trace_codes = [form['trace_code'] for form in forms]
+        duplicates = {code for code in trace_codes if trace_codes.count(code) > 1}
+        duplicates.update(DeviceRawMaterial.objects.filter(trace_code__in=trace_codes).values_list('trace_code', flat=True))
+        if duplicates:
+            raise serializers.ValidationError(
+                f"Raw material forms with these trace codes already exist: {', '.join(sorted(duplicates))}."
+            )
+        return forms
+
+    @transaction.atomic
+    def create(self, validated_data):
+        process = self._get_process(validated_data['workflow_id'])
+        forms, tests_per_form = [], []
+        for form_data in validated_data['forms']:
+            tests_per_form.append(form_data.pop('qc_tests_wire', []))
+            forms.append(DeviceRawMaterial(manufacturing_process=process, **form_data))
+        DeviceRawMaterial.objects.bulk_create(forms)
+        index_forms(forms)  # bulk_create sends no post_save
+
+        content_type = ContentType.objects.get_for_model(DeviceRawMaterial)
+        QcTestWire.objects.bulk_create([
+            QcTestWire(content_type=content_type, object_id=form.pk, **_without_id(test_data))
+            for form, tests in zip(forms, tests_per_form)
+            for test_data in tests
+        ])
+        return forms
+
 class DeviceChecklistSerializer(QcTestWireableModelSerializerMixin, BaseWorkflowFormSerializer):
     qc_tests_wire = QcTestWireSerializer(many=True, required=False)
     stage = serializers.ReadOnlyField(source='manufacturing_process.stage', read_only=True)
     current_step = serializers.ReadOnlyField(source='manufacturing_process.current_step', read_only=True)
 
+    prefetch_related_fields = ('qc_tests_wire',)
+
     class Meta:
         model = DeviceChecklist
         fields = '__all__'
@@ -402,6 +687,9 @@ class DeviceProductionSerializer(BaseWorkflowFormSerializer):
     stage = serializers.ReadOnlyField(source='manufacturing_process.stage', read_only=True)
     current_step = serializers.ReadOnlyField(source='manufacturing_process.current_step', read_only=True)
     
+    # Generic prefetch: one QC test query per device type for all rows on the page.
+    prefetch_related_fields = ('production__production_qc_test', 'production_wastes')
+
     class Meta:
         model = DeviceProduction
         fields = '__all__'
@@ -413,12 +701,13 @@ class DeviceProductionSerializer(BaseWorkflowFormSerializer):
         # Call the parent create method to handle workflow linking
         instance = super().create(validated_data)
         
-        # Now create the nested objects
-        for prod_item in production_data:
-            Production.objects.create(device_production=instance, **prod_item)
-            
-        for waste_item in wastes_data:
-            ProductionWaste.objects.create(device_production=instance, **waste_item)
+        # Now create the nested objects; any client-sent ids are ignored on create.
+        Production.objects.bulk_create([
+            Production(device_production=instance, **_without_id(prod_item)) for prod_item in production_data
+        ])
+        ProductionWaste.objects.bulk_create([
+            ProductionWaste(device_production=instance, **_without_id(waste_item)) for waste_item in wastes_data
+        ])
             
         return instance
 
@@ -426,20 +715,23 @@ class DeviceProductionSerializer(BaseWorkflowFormSerializer):
         production_data = validated_data.pop('production', None)
         wastes_data = validated_data.pop('production_wastes', None)
         
-        instance = super().update(instance, validated_data)
-        
-        if production_data is not None:
-            # This simple update logic assumes you might want to replace existing
-            # production records. A more complex logic might be needed to update
-            # existing records based on an ID.
-            instance.production.all().delete()
-            for prod_item in production_data:
-                Production.objects.create(device_production=instance, **prod_item)
-                    
-        if wastes_data is not None:
-            instance.production_wastes.all().delete()
-            for waste_item in wastes_data:
-                ProductionWaste.objects.create(device_production=instance, **waste_item)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+
+            # Rows sent with an 'id' are updated in place, rows without one are
+            # added and rows left out are removed; untouched rows keep their
+            # primary keys and production_qc_test links.
+            if production_data is not None:
+                _sync_nested(
+                    Production.objects.filter(device_production=instance), production_data,
+                    lambda data: Production(device_production=instance, **data),
+                )
+
+            if wastes_data is not None:
+                _sync_nested(
+                    ProductionWaste.objects.filter(device_production=instance), wastes_data,
+                    lambda data: ProductionWaste(device_production=instance, **data),
+                )
                 
         return instance
 
@@ -454,19 +746,42 @@ class DeviceProductSerializer(BaseWorkflowFormSerializer):
 # --- Master Workflow Serializers ---
 
 class ManufacturingProcessActionSerializer(serializers.ModelSerializer):
+    # Callers select_related('user') so a page of actions costs one query.
     user = serializers.StringRelatedField()
     class Meta:
         model = ManufacturingProcessAction
         fields = '__all__'
 
-class WireManufacturingProcessSerializer(serializers.ModelSerializer):
+class WireManufacturingProcessSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     raw_materials = DeviceRawMaterialSerializer(many=True, read_only=True) # Changed from raw_material
     authorization = DeviceAuthorizationSerializer(read_only=True)
     checklist = DeviceChecklistSerializer(read_only=True)
     production = DeviceProductionSerializer(read_only=True)
     product_final = DeviceProductSerializer(read_only=True)
-    actions = ManufacturingProcessActionSerializer(many=True, read_only=True)
+    # Only the newest actions; the full history is paginated at workflow/process/<pk>/actions/.
+    actions = ManufacturingProcessActionSerializer(many=True, read_only=True, source='latest_actions')
+    actions_count = serializers.IntegerField(read_only=True)
+
+    # Loaded by WireManufacturingProcessQuerySet.with_details() with the same fields/expand.
+    expandable_fields = {
+        'raw_materials': _collapsed_pks,
+        'authorization': _collapsed_pk,
+        'checklist': _collapsed_pk,
+        'production': _collapsed_pk,
+        'product_final': _collapsed_pk,
+        'actions': lambda: serializers.PrimaryKeyRelatedField(many=True, read_only=True, source='latest_actions'),
+    }
     
     class Meta:
         model = WireManufacturingProcess
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class WireManufacturingProcessSummarySerializer(serializers.ModelSerializer):
+    """Slim process representation for list views; child forms are referenced by id only."""
+    class Meta:
+        model = WireManufacturingProcess
+        fields = [
+            'id', 'stage', 'current_step', 'current_actor', 'is_completed', 'is_rejected',
+            'authorization', 'checklist', 'production', 'product_final',
+            'created_by', 'created_at', 'updated_at',
+        ]
@@ -1,107 +1,191 @@
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
-from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
 from .models import WireManufacturingProcess, ManufacturingProcessAction
-from .workflow import WIRE_WORKFLOW
+from .workflow import get_workflow_state_machine
+from .authorization import WireAuthorizationContext
 from apps.users.models import QcUserModel
 
+class WorkflowConflict(APIException):
+    """Raised when a process moved on between reading it and applying a transition."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The process was changed by another user. Reload it and try again."
+    default_code = 'conflict'
+
+def _error_message(exc):
+    """Flattens DRF and Django exceptions into a single message string."""
+    detail = getattr(exc, 'detail', None)
+    if isinstance(detail, list) and detail:
+        return str(detail[0])
+    return str(detail if detail is not None else exc)
+
 class ManufacturingWorkflowService:
-    def __init__(self, user: QcUserModel):
+    def __init__(self, user: QcUserModel, auth: WireAuthorizationContext = None):
         """
-        Initializes the service with the request user.
+        Initializes the service with the request user. Pass the request's
+        authorization context to reuse group membership already loaded by
+        the permission classes.
         """
         self.user = user
-        self.workflow_config = WIRE_WORKFLOW
-        self.stages_order = list(self.workflow_config.keys())
+        self._auth = auth
+        self.workflow = get_workflow_state_machine()
 
     def start_process(self):
         """Starts a new master manufacturing process."""
         process = WireManufacturingProcess.objects.create(
-            stage=self.stages_order[0], # Start at the first stage
+            stage=self.workflow.first_stage, # Start at the first stage
             current_step=1,
             created_by=self.user
         )
         self._log_action(process, 'start', process.stage, 0, process.stage, 1, "Process started.")
         return process
 
+    @transaction.atomic
     def approve_or_reject_step(self, process_id: int, action: str, comment: str = None):
-        """Processes an 'approve' or 'reject' action on the master workflow."""
-        process = self._get_process(process_id)
-        if process.is_completed:
-            raise ValidationError("This process is already complete.")
-
-        stage_config = self.workflow_config.get(process.stage)
-        step_config = self._get_step_config(stage_config, process.current_step)
-        
-        self._check_permission(step_config)
-
-        from_stage, from_step = process.stage, process.current_step
-        
-        if action == 'approve':
-            self._handle_approval(process, stage_config)
-        elif action == 'reject':
-            self._handle_rejection(process, step_config, comment)
-        else:
-            raise ValidationError("Invalid action.")
+        """
+        Processes an 'approve' or 'reject' action on the master workflow.
 
-        process.save()
+        The transition is written as a single UPDATE guarded by the (stage, step)
+        the caller saw, so concurrent approvers cannot both advance the same step;
+        the loser gets a WorkflowConflict instead of silently skipping a step.
+        """
+        process = self._get_process(process_id)
+        from_stage, from_step = self._transition(process, action, comment)
         self._log_action(process, action, from_stage, from_step, process.stage, process.current_step, comment)
-        
-        if action == 'reject':
-            process.is_rejected = False
-            process.save(update_fields=['is_rejected'])
 
         return process
 
+    @transaction.atomic
+    def bulk_approve_or_reject(self, items):
+        """
+        Applies many approve/reject actions in one call.
+
+        `items` is a list of dicts with 'process_id', 'action' and optional
+        'comment'. All processes are loaded in one query, the user's groups are
+        read once, and the action log is written with a single bulk_create.
+        Items are applied in order and fail independently; the result list
+        mirrors the input with either the new state or an error per item.
+        """
+        processes = WireManufacturingProcess.objects.in_bulk({item['process_id'] for item in items})
+        results, actions = [], []
+
+        for item in items:
+            process_id, action, comment = item['process_id'], item['action'], item.get('comment')
+            process = processes.get(process_id)
+            if process is None:
+                results.append({'process_id': process_id, 'success': False, 'detail': f"Process with ID {process_id} not found."})
+                continue
+
+            try:
+                from_stage, from_step = self._transition(process, action, comment)
+            except (ValidationError, PermissionDenied, WorkflowConflict) as e:
+                if isinstance(e, WorkflowConflict):
+                    # Another user moved this process; resync so later items see the real state.
+                    process.refresh_from_db(fields=['stage', 'current_step', 'is_completed', 'is_rejected', 'current_actor', 'updated_at'])
+                results.append({'process_id': process_id, 'success': False, 'detail': _error_message(e)})
+                continue
+
+            actions.append(self._build_action(process, action, from_stage, from_step, process.stage, process.current_step, comment))
+            results.append({
+                'process_id': process_id, 'success': True,
+                'stage': process.stage, 'current_step': process.current_step, 'is_completed': process.is_completed,
+            })
+
+        ManufacturingProcessAction.objects.bulk_create(actions)
+        return results
+
     def _get_process(self, process_id):
         try:
             return WireManufacturingProcess.objects.get(pk=process_id)
         except WireManufacturingProcess.DoesNotExist:
             raise ValidationError(f"Process with ID {process_id} not found.")
 
-    def _get_step_config(self, stage_config, step_number):
-        step_config = next((s for s in stage_config.get('steps', []) if s['step'] == step_number), None)
-        if not step_config:
-            raise ValidationError(f"Configuration for step {step_number} not found.")
-        return step_config
+    def _get_step(self, process):
+        step = self.workflow.get_step(process.stage, process.current_step)
+        if not step:
+            raise ValidationError(f"Configuration for step {process.current_step} not found.")
+        return step
+
+    @cached_property
+    def auth(self):
+        return self._auth or WireAuthorizationContext.for_user(self.user)
 
-    def _check_permission(self, step_config):
-        required_group = step_config.get('actor_permission')
-        if not self.user.groups.filter(name=required_group).exists() and not self.user.is_superuser:
+    def _check_permission(self, step):
+        required_group = step.actor_permission
+        if not self.auth.can_act_as(required_group):
             raise PermissionDenied(f"Required group: '{required_group}'.")
 
-    def _handle_approval(self, process, stage_config):
-        next_step_number = process.current_step + 1
-        is_last_step = not any(s['step'] == next_step_number for s in stage_config['steps'])
+    def _transition(self, process, action, comment):
+        """
+        Validates and persists one transition on an already-loaded process.
+        Returns the (stage, step) the process was moved from.
+        """
+        if process.is_completed:
+            raise ValidationError("This process is already complete.")
 
-        if is_last_step:
-            self._transition_to_next_stage(process)
-        else:
-            process.current_step = next_step_number
+        step = self._get_step(process)
+        
+        self._check_permission(step)
 
-    def _transition_to_next_stage(self, process):
-        current_stage_index = self.stages_order.index(process.stage)
-        if current_stage_index + 1 < len(self.stages_order):
-            process.stage = self.stages_order[current_stage_index + 1]
-            process.current_step = 1
+        from_stage, from_step = process.stage, process.current_step
+        
+        if action == 'approve':
+            self._handle_approval(process, step)
+        elif action == 'reject':
+            self._handle_rejection(process, step, comment)
         else:
+            raise ValidationError("Invalid action.")
+
+        self._apply_transition(process, from_stage, from_step)
+        return from_stage, from_step
+
+    def _handle_approval(self, process, step):
+        if step.completes_process:
             process.is_completed = True
+        else:
+            process.stage = step.next_stage
+            process.current_step = step.next_step
 
-    def _handle_rejection(self, process, step_config, comment):
-        on_reject = step_config.get('on_reject')
-        if not on_reject:
+    def _handle_rejection(self, process, step, comment):
+        if not step.can_reject:
             raise ValidationError("This step cannot be rejected.")
         if not comment:
-            raise ValidationError(on_reject.get('message', "A rejection reason is required."))
-        process.current_step = on_reject['go_to_step']
-        process.is_rejected = True
+            raise ValidationError(step.reject_message)
+        process.current_step = step.reject_to_step
+
+    def _apply_transition(self, process, from_stage, from_step):
+        """Persists the new state only if the process is still at (from_stage, from_step)."""
+        # A rejection only flags the process while it is being logged; the stored
+        # state is always "not rejected" once the action has been recorded.
+        process.is_rejected = False
+        process.updated_at = timezone.now()
+        process.sync_current_actor()
+        updated = WireManufacturingProcess.objects.filter(
+            pk=process.pk, stage=from_stage, current_step=from_step, is_completed=False,
+        ).update(
+            stage=process.stage,
+            current_step=process.current_step,
+            is_completed=process.is_completed,
+            is_rejected=process.is_rejected,
+            current_actor=process.current_actor,
+            updated_at=process.updated_at,
+        )
+        if not updated:
+            raise WorkflowConflict()
 
-    def _log_action(self, process, action_type, from_stage, from_step, to_stage, to_step, comment):
-        ManufacturingProcessAction.objects.create(
+    def _build_action(self, process, action_type, from_stage, from_step, to_stage, to_step, comment):
+        return ManufacturingProcessAction(
             process=process, user=self.user, action_type=action_type,
             from_stage=from_stage, from_step=from_step,
             to_stage=to_stage, to_step=to_step, comment=comment
         )
+
+    def _log_action(self, process, action_type, from_stage, from_step, to_stage, to_step, comment):
+        self._build_action(process, action_type, from_stage, from_step, to_stage, to_step, comment).save()
         
     def delete_process(self, process_id: int):
         """Hard deletes a master process and its log."""
@@ -0,0 +1,107 @@
+# apps/wire/signals.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from apps.marketing.models import Customer, Product
+
+from .authorization import invalidate_user_groups
+from .fragments import FORM_MODELS, NESTED_OWNERS, fragment_cache
+from .lookups import LOOKUP_MODELS, lookup_cache
+from .search import SEARCH_FIELDS, SEARCHABLE_MODELS, index_forms, unindex_form
+
+
+# --- Cached group membership -------------------------------------------------
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        invalidate_user_groups([instance.pk])
+    elif action == 'pre_clear':
+        # group.user_set.clear(): collect members before the rows disappear
+        invalidate_user_groups(instance.user_set.values_list('pk', flat=True))
+    else:
+        # group.user_set.add/remove(...)
+        invalidate_user_groups(pk_set or [])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Renaming or deleting a group changes the cached names of all its members.
+    if instance.pk:
+        invalidate_user_groups(instance.user_set.values_list('pk', flat=True))
+
+
+# --- Cross-form search index -------------------------------------------------
+
+def form_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS)):
+        return
+    index_forms([instance])
+
+
+def form_deleted(sender, instance, **kwargs):
+    unindex_form(instance)
+
+
+for model in SEARCHABLE_MODELS:
+    post_save.connect(form_saved, sender=model, dispatch_uid=f"wire-search-save-{model._meta.model_name}")
+    post_delete.connect(form_deleted, sender=model, dispatch_uid=f"wire-search-delete-{model._meta.model_name}")
+
+
+# --- Lookup cache version ----------------------------------------------------
+
+def lookup_changed(sender, **kwargs):
+    # Bump now so the writing request reads its own change, and again after
+    # commit so no other request can have cached the pre-commit rows under it.
+    lookup_cache.invalidate()
+    transaction.on_commit(lookup_cache.invalidate)
+
+
+for model in LOOKUP_MODELS.values():
+    post_save.connect(lookup_changed, sender=model, dispatch_uid=f"wire-lookups-save-{model._meta.model_name}")
+    post_delete.connect(lookup_changed, sender=model, dispatch_uid=f"wire-lookups-delete-{model._meta.model_name}")
+
+
+# --- Form fragment cache -----------------------------------------------------
+# Invalidated now so the writing request reads its own change, and again after
+# commit so no other request keeps a fragment rendered from pre-commit rows.
+
+def _invalidate_fragment(model, pk):
+    fragment_cache.invalidate(model, pk)
+    transaction.on_commit(lambda: fragment_cache.invalidate(model, pk))
+
+
+def form_fragment_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_fragment(sender, instance.pk)
+
+
+def nested_fragment_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_fragment(*NESTED_OWNERS[sender](instance))
+
+
+def shared_fragment_changed(sender, **kwargs):
+    # Lookups, products and customers are embedded in many forms.
+    fragment_cache.invalidate_all()
+    transaction.on_commit(fragment_cache.invalidate_all)
+
+
+for model in FORM_MODELS:
+    post_save.connect(form_fragment_changed, sender=model, dispatch_uid=f"wire-fragments-save-{model._meta.model_name}")
+    post_delete.connect(form_fragment_changed, sender=model, dispatch_uid=f"wire-fragments-delete-{model._meta.model_name}")
+
+for model in NESTED_OWNERS:
+    post_save.connect(nested_fragment_changed, sender=model, dispatch_uid=f"wire-fragments-save-{model._meta.model_name}")
+    post_delete.connect(nested_fragment_changed, sender=model, dispatch_uid=f"wire-fragments-delete-{model._meta.model_name}")
+
+for model in (*LOOKUP_MODELS.values(), Product, Customer):
+    post_save.connect(shared_fragment_changed, sender=model, dispatch_uid=f"wire-fragments-shared-save-{model._meta.label_lower}")
+    post_delete.connect(shared_fragment_changed, sender=model, dispatch_uid=f"wire-fragments-shared-delete-{model._meta.label_lower}")
@@ -0,0 +1,62 @@
+# apps/wire/snapshots.py
+import gzip
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from .models import WireProcessSnapshot
+
+
+def stored_snapshot(process_id, etag):
+    """The compressed body stored for `process_id` under `etag`, or None if missing or stale."""
+    return WireProcessSnapshot.objects.filter(process_id=process_id, etag=etag).values_list('data', flat=True).first()
+
+
+def store_snapshot(process_id, etag, data):
+    """Renders `data` as the API would and stores it compressed; returns the compressed body."""
+    body = gzip.compress(JSONRenderer().render(data), mtime=0)
+    # Concurrent first reads may both store; update_or_create resolves the race.
+    WireProcessSnapshot.objects.update_or_create(process_id=process_id, defaults={'etag': etag, 'data': body})
+    return body
+
+
+def accepts_gzip(request):
+    """Whether Accept-Encoding allows gzip, honoring q-values (`gzip;q=0` refuses it)."""
+    qualities = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def snapshot_etag(request, etag):
+    """
+    The ETag of the snapshot body `request` will get. The gzip bytes are a
+    different representation from the JSON, so they get their own ETag.
+    """
+    return f'{etag[:-1]}-gzip"' if accepts_gzip(request) else etag
+
+
+def snapshot_response(request, body):
+    """
+    A JSON response for a stored snapshot. Clients that accept gzip get the
+    stored bytes as they are; others get them decompressed.
+    """
+    body = bytes(body)
+    if accepts_gzip(request):
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type='application/json')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -1,4 +1,1173 @@
 # apps/wire/test.py
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import time
+import timeit
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from apps.marketing.models import Product
+from apps.users.models import QcUserModel
+from .models import (
+    WireManufacturingProcess, ManufacturingProcessAction,
+    DeviceRawMaterial, DeviceAuthorization, DeviceChecklist, DeviceProduction, DeviceProduct,
+    LicenseProduction, Packaging, RawMaterialSpecifications,
+    Production, ProductionWaste, QcTestWire, IdempotencyRecord, WireFormSearchEntry, WireProcessSnapshot,
+)
+from .dir_classes.device_settings import FormExtruderSettings, FormRadiantSettings
+from .dir_classes.wire_abstract_class import WireFormName, Material
+from .dir_classes.production_qc_settings import ProductionExtruderQcTestWire
+from .authorization import WireAuthorizationContext
+from .ingestion import ProductionRowImporter
+from .search import search_forms
+from .lookups import lookup_cache
+from .fragments import fragment_cache
+from .snapshots import store_snapshot
+from .serializers import (
+    DeviceChecklistSerializer, DeviceProductionSerializer, DeviceRawMaterialSerializer, DeviceSettingsRelatedField,
+    device_types,
+)
+from .services import ManufacturingWorkflowService, WorkflowConflict
+from .workflow import WIRE_WORKFLOW, WorkflowStateMachine, get_workflow_state_machine
+
+
+class WireTestDataMixin:
+    """Builds complete process trees for the wire tests."""
+    _trace_counter = 0
+
+    def make_user(self, username='qc', is_superuser=True):
+        return QcUserModel.objects.create(username=username, is_superuser=is_superuser)
+
+    def form_kwargs(self, prefix):
+        WireTestDataMixin._trace_counter += 1
+        return {
+            'document_code': f"{prefix}-DOC",
+            'trace_date': datetime.date(2025, 9, 16),
+            'trace_code': f"{prefix}-TRACE-{WireTestDataMixin._trace_counter}",
+        }
+
+    def make_process(self, user, children=1):
+        """Creates a process with `children` items in every one-to-many branch."""
+        authorization = DeviceAuthorization.objects.create(**self.form_kwargs('AUTH'))
+        LicenseProduction.objects.create(authorization=authorization, setup_license_number='SETUP-1')
+        Packaging.objects.create(authorization=authorization, packaging_type='Reel')
+        settings = FormExtruderSettings.objects.create(authorization=authorization)
+        authorization.device_settings = settings
+        authorization.save()
+
+        checklist = DeviceChecklist.objects.create(**self.form_kwargs('CHK'))
+        production = DeviceProduction.objects.create(**self.form_kwargs('PROD'))
+
+        process = WireManufacturingProcess.objects.create(
+            created_by=user, authorization=authorization, checklist=checklist, production=production,
+        )
+
+        for i in range(children):
+            raw_material = DeviceRawMaterial.objects.create(manufacturing_process=process, **self.form_kwargs('RM'))
+            QcTestWire.objects.create(content_object=raw_material, description=f"rm test {i}")
+            QcTestWire.objects.create(content_object=checklist, description=f"checklist test {i}")
+            RawMaterialSpecifications.objects.create(authorization=authorization, raw_material_type=f"type {i}")
+            row = Production.objects.create(device_production=production, input_spool_number=f"SP-{i}")
+            row.production_qc_test = ProductionExtruderQcTestWire.objects.create(production=row)
+            row.save()
+            ProductionWaste.objects.create(device_production=production, waste_type=f"waste {i}")
+            ManufacturingProcessAction.objects.create(
+                process=process, user=user, action_type='approve',
+                from_stage='rawmaterial', from_step=1, to_stage='rawmaterial', to_step=2,
+            )
+        return process
+
+
+class ManufacturingProcessDetailQueryCountTests(WireTestDataMixin, TestCase):
+    # version stamps + process + raw materials + rm tests + specs + settings
+    # + checklist tests + production rows + production QC tests + wastes + actions
+    EXPECTED_QUERIES = 11
+
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Warm the ContentType cache so GFK lookups are not counted.
+        ContentType.objects.get_for_models(DeviceRawMaterial, DeviceChecklist, FormExtruderSettings, ProductionExtruderQcTestWire)
+
+    def _get_detail(self, process):
+        return self.client.get(reverse('manufacturing-process-detail', args=[process.pk]))
+
+    def test_detail_query_count_is_bounded(self):
+        process = self.make_process(self.user, children=1)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self._get_detail(process)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_query_count_does_not_grow_with_children(self):
+        process = self.make_process(self.user, children=6)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self._get_detail(process)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['raw_materials']), 6)
+        self.assertEqual(len(response.data['production']['production']), 6)
+        self.assertEqual(len(response.data['actions']), 6)
+
+    def test_detail_embeds_only_the_latest_actions(self):
+        process = self.make_process(self.user, children=1)
+        limit = WireManufacturingProcess.latest_actions_limit
+        for _ in range(limit + 2):
+            ManufacturingProcessAction.objects.create(
+                process=process, user=self.user, action_type='reject',
+                from_stage='production', from_step=3, to_stage='production', to_step=1,
+            )
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self._get_detail(process)
+        self.assertEqual(response.data['actions_count'], limit + 3)
+        newest = process.actions.order_by('-timestamp', '-id').values_list('pk', flat=True)[:limit]
+        self.assertEqual([action['id'] for action in response.data['actions']], list(newest))
+
+    def test_fields_skip_nested_serializers_and_prefetches(self):
+        process = self.make_process(self.user, children=3)
+        url = reverse('manufacturing-process-detail', args=[process.pk])
+        with mock.patch.object(DeviceRawMaterialSerializer, '__init__', side_effect=AssertionError):
+            # version stamps + the process row
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'fields': 'stage,current_step'})
+        self.assertEqual(response.data, {'stage': process.stage, 'current_step': process.current_step})
+
+    def test_unexpanded_relations_are_ids(self):
+        process = self.make_process(self.user, children=3)
+        url = reverse('manufacturing-process-detail', args=[process.pk])
+        # version stamps + process + raw material ids + action ids + checklist tests
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'expand': 'checklist'})
+        self.assertEqual(sorted(response.data['raw_materials']), sorted(process.raw_materials.values_list('pk', flat=True)))
+        self.assertEqual(response.data['authorization'], process.authorization_id)
+        self.assertEqual(len(response.data['actions']), 3)
+        self.assertEqual(len(response.data['checklist']['qc_tests_wire']), 3)
+
+        self.assertEqual(self.client.get(url, {'expand': 'created_by'}).status_code, 400)
+
+    def test_form_fields_and_expand(self):
+        process = self.make_process(self.user, children=2)
+        url = reverse('deviceauthorization-detail', args=[process.authorization_id])
+        # version stamps + the form row
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'fields': 'id,trace_code'})
+        self.assertEqual(set(response.data), {'id', 'trace_code'})
+
+        response = self.client.get(url, {'fields': 'id,form_name', 'expand': ''})
+        self.assertEqual(response.data['form_name'], process.authorization.form_name_id)
+
+    def test_unchanged_detail_is_not_modified(self):
+        process = self.make_process(self.user, children=2)
+        etag = self._get_detail(process)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('manufacturing-process-detail', args=[process.pk]), HTTP_IF_NONE_MATCH=etag,
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_changes_anywhere_in_the_tree_change_the_etag(self):
+        process = self.make_process(self.user, children=2)
+        etags = [self._get_detail(process)['ETag']]
+
+        raw_material = process.raw_materials.first()
+        raw_material.description = 'edited'
+        raw_material.save()
+        etags.append(self._get_detail(process)['ETag'])
+
+        raw_material.delete()
+        etags.append(self._get_detail(process)['ETag'])
+
+        ManufacturingWorkflowService(user=self.user).approve_or_reject_step(process.pk, 'approve')
+        etags.append(self._get_detail(process)['ETag'])
+
+        self.assertEqual(len(set(etags)), 4)
+        response = self.client.get(reverse('manufacturing-process-detail', args=[process.pk]), HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since_is_not_answered_after_a_delete(self):
+        process = self.make_process(self.user, children=2)
+        first = self._get_detail(process)
+        self.assertNotIn('Last-Modified', first)
+        process.raw_materials.order_by('-updated_at').first().delete()
+        response = self.client.get(
+            reverse('manufacturing-process-detail', args=[process.pk]),
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_form_retrieve_is_conditional(self):
+        process = self.make_process(self.user, children=1)
+        url = reverse('devicechecklist-detail', args=[process.checklist_id])
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        # The embedded stage/current_step follow the process.
+        ManufacturingWorkflowService(user=self.user).approve_or_reject_step(process.pk, 'approve')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_authorization_etag_follows_embedded_shared_rows(self):
+        process = self.make_process(self.user, children=1)
+        product = Product.objects.create(name='Cable')
+        DeviceAuthorization.objects.filter(pk=process.authorization_id).update(product=product)
+        url = reverse('deviceauthorization-detail', args=[process.authorization_id])
+        first = self.client.get(url)
+        # Not a per-worker counter: a flushed cache keeps the ETag.
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        product.name = 'Shielded cable'
+        product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['product']['name'], 'Shielded cable')
+
+
+class ProcessActionHistoryTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _collect(self, url, params):
+        pages, ids = 0, []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [action['id'] for action in response.data['results']]
+            url, params, pages = response.data['next'], None, pages + 1
+        return pages, ids
+
+    def test_pages_cover_the_history_newest_first(self):
+        process = self.make_process(self.user, children=7)
+        self.make_process(self.user, children=2)
+        url = reverse('manufacturing-process-actions', args=[process.pk])
+        pages, ids = self._collect(url, {'page_size': 3})
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, list(process.actions.order_by('-timestamp', '-id').values_list('pk', flat=True)))
+
+    def test_page_query_count_is_constant(self):
+        process = self.make_process(self.user, children=8)
+        url = reverse('manufacturing-process-actions', args=[process.pk])
+        # process exists + one page of actions with their users
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['user'], str(self.user))
+
+    def test_missing_process_is_not_found(self):
+        response = self.client.get(reverse('manufacturing-process-actions', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CompletedProcessSnapshotTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        ContentType.objects.get_for_models(DeviceRawMaterial, DeviceChecklist, FormExtruderSettings, ProductionExtruderQcTestWire)
+        self.process = self.make_process(self.user, children=3)
+        WireManufacturingProcess.objects.filter(pk=self.process.pk).update(is_completed=True)
+        self.url = reverse('manufacturing-process-detail', args=[self.process.pk])
+
+    def test_completed_tree_is_served_from_the_snapshot(self):
+        first = self.client.get(self.url)
+        self.assertEqual(WireProcessSnapshot.objects.get(pk=self.process.pk).etag, first['ETag'])
+        # version stamps + the stored snapshot
+        with self.assertNumQueries(2):
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), json.loads(first.content))
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), second.json())
+        self.assertNotEqual(compressed['ETag'], first['ETag'])
+        revalidated = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=compressed['ETag']).status_code, 200)
+
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(refused.json(), second.json())
+
+    def test_storing_again_replaces_the_snapshot(self):
+        self.client.get(self.url)
+        snapshot = WireProcessSnapshot.objects.get(pk=self.process.pk)
+        # As a second request that missed the snapshot at the same time would.
+        store_snapshot(self.process.pk, snapshot.etag, {'id': self.process.pk})
+        self.assertEqual(WireProcessSnapshot.objects.filter(pk=self.process.pk).count(), 1)
+
+    def test_superuser_edit_rebuilds_the_snapshot(self):
+        self.client.get(self.url)
+        raw_material = self.process.raw_materials.first()
+        raw_material.description = 'corrected'
+        raw_material.save()
+
+        response = self.client.get(self.url)
+        descriptions = {row['id']: row['description'] for row in response.json()['raw_materials']}
+        self.assertEqual(descriptions[raw_material.pk], 'corrected')
+        self.assertEqual(WireProcessSnapshot.objects.get(pk=self.process.pk).etag, response['ETag'])
+        self.assertEqual(self.client.get(self.url).json(), response.json())
+
+    def test_shared_rows_rebuild_the_snapshot(self):
+        product = Product.objects.create(name='Cable')
+        DeviceAuthorization.objects.filter(pk=self.process.authorization_id).update(product=product)
+        first = self.client.get(self.url)
+        product.name = 'Shielded cable'
+        product.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['authorization']['product']['name'], 'Shielded cable')
+
+    def test_sparse_requests_bypass_the_snapshot(self):
+        response = self.client.get(self.url, {'fields': 'stage,is_completed'})
+        self.assertEqual(response.data, {'stage': self.process.stage, 'is_completed': True})
+        self.assertFalse(WireProcessSnapshot.objects.exists())
+
+
+class ManufacturingProcessListTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('manufacturing-process-list')
+
+    def test_filters_by_stage_and_completion(self):
+        WireManufacturingProcess.objects.create(created_by=self.user, stage='license', current_step=2)
+        WireManufacturingProcess.objects.create(created_by=self.user, stage='license', is_completed=True)
+        WireManufacturingProcess.objects.create(created_by=self.user)
+
+        response = self.client.get(self.url, {'stage': 'license', 'is_completed': 'false'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['current_step'] for p in response.data['results']], [2])
+
+    def test_keyset_pages_cover_every_process_once(self):
+        created = [WireManufacturingProcess.objects.create(created_by=self.user).pk for _ in range(5)]
+        seen, url = [], self.url + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen += [p['id'] for p in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(created))
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get(self.url, {'current_step': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProcessBatchFetchTests(WireTestDataMixin, TestCase):
+    # process + raw materials + rm tests + specs + settings + checklist tests
+    # + production rows + production QC tests + wastes + latest actions
+    FULL_QUERIES = 10
+
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('manufacturing-process-list')
+        ContentType.objects.get_for_models(DeviceRawMaterial, DeviceChecklist, FormExtruderSettings, ProductionExtruderQcTestWire)
+
+    def _ids(self, processes):
+        return ','.join(str(process.pk) for process in processes)
+
+    def test_summaries_in_requested_order(self):
+        processes = [WireManufacturingProcess.objects.create(created_by=self.user) for _ in range(3)]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'ids': f"{processes[2].pk},999999,{processes[0].pk}"})
+        self.assertEqual([p['id'] for p in response.data['results']], [processes[2].pk, processes[0].pk])
+        self.assertEqual(response.data['missing'], [999999])
+        self.assertNotIn('raw_materials', response.data['results'][0])
+
+    def test_full_trees_share_one_prefetch_plan(self):
+        few = [self.make_process(self.user, children=1) for _ in range(2)]
+        many = few + [self.make_process(self.user, children=3) for _ in range(4)]
+        for processes in (few, many):
+            with self.assertNumQueries(self.FULL_QUERIES):
+                response = self.client.get(self.url, {'ids': self._ids(processes), 'representation': 'full'})
+            self.assertEqual(len(response.data['results']), len(processes))
+        detail = self.client.get(reverse('manufacturing-process-detail', args=[many[-1].pk]))
+        self.assertEqual(response.data['results'][-1], detail.data)
+
+    def test_full_trees_accept_sparse_fieldsets(self):
+        processes = [self.make_process(self.user, children=2) for _ in range(2)]
+        # process + raw material ids
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {
+                'ids': self._ids(processes), 'representation': 'full', 'fields': 'id,stage,raw_materials', 'expand': '',
+            })
+        self.assertEqual(set(response.data['results'][0]), {'id', 'stage', 'raw_materials'})
+        self.assertEqual(len(response.data['results'][1]['raw_materials']), 2)
+
+    def test_invalid_ids_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, 400)
+        too_many = ','.join(str(pk) for pk in range(1, 202))
+        self.assertEqual(self.client.get(self.url, {'ids': too_many}).status_code, 400)
+
+
+class WorkflowStateMachineTests(SimpleTestCase):
+    def setUp(self):
+        self.machine = get_workflow_state_machine()
+
+    def test_transitions_are_precomputed(self):
+        last_rawmaterial = self.machine.get_step('rawmaterial', 4)
+        self.assertTrue(last_rawmaterial.is_last_step)
+        self.assertEqual((last_rawmaterial.next_stage, last_rawmaterial.next_step), ('license', 1))
+
+        middle = self.machine.get_step('production', 3)
+        self.assertEqual((middle.next_stage, middle.next_step), ('production', 4))
+        self.assertEqual(self.machine.get_step('production', 5).reject_to_step, 2)
+
+        self.assertTrue(self.machine.get_step('product', 1).completes_process)
+        self.assertIsNone(self.machine.get_step('product', 2))
+
+    def test_group_reverse_index(self):
+        self.assertEqual(self.machine.steps_for_group('FO'), {('license', 4), ('checklist', 6)})
+        self.assertEqual(self.machine.steps_for_group('nobody'), frozenset())
+
+    def test_compiled_steps_are_immutable(self):
+        step = self.machine.get_step('production', 2)
+        with self.assertRaises(TypeError):
+            step.details['fields'] = []
+        with self.assertRaises(AttributeError):
+            step.actor_permission = 'QC'
+
+    def test_invalid_config_is_rejected(self):
+        broken = {'stage': {'steps': [{'step': 1, 'actor_permission': 'QC', 'on_reject': {'go_to_step': 3}}]}}
+        with self.assertRaises(ImproperlyConfigured):
+            WorkflowStateMachine(broken)
+
+    def test_transition_resolution_benchmark(self):
+        """Compiled lookup must beat the linear scan it replaced."""
+        def linear_scan():
+            for stage, config in WIRE_WORKFLOW.items():
+                for s in config['steps']:
+                    next((x for x in config['steps'] if x['step'] == s['step']), None)
+                    stages = list(WIRE_WORKFLOW.keys())
+                    stages.index(stage)
+
+        keys = [(stage, s['step']) for stage, config in WIRE_WORKFLOW.items() for s in config['steps']]
+
+        def compiled():
+            for stage, number in keys:
+                self.machine.get_step(stage, number).next_stage
+
+        linear = min(timeit.repeat(linear_scan, number=500, repeat=3))
+        fast = min(timeit.repeat(compiled, number=500, repeat=3))
+        self.assertLess(fast, linear)
+
+
+class ManufacturingWorkflowServiceTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.service = ManufacturingWorkflowService(user=self.user)
+
+    def test_approve_advances_and_logs(self):
+        process = self.service.start_process()
+        for _ in range(4):
+            process = self.service.approve_or_reject_step(process.pk, 'approve')
+        process.refresh_from_db()
+        self.assertEqual((process.stage, process.current_step), ('license', 1))
+        self.assertEqual(process.actions.filter(action_type='approve').count(), 4)
+
+    def test_reject_returns_to_configured_step(self):
+        process = WireManufacturingProcess.objects.create(created_by=self.user, stage='production', current_step=6)
+        self.service.approve_or_reject_step(process.pk, 'reject', comment='bad spool')
+        process.refresh_from_db()
+        self.assertEqual(process.current_step, 2)
+        self.assertFalse(process.is_rejected)
+
+    def test_stale_transition_raises_conflict(self):
+        process = self.service.start_process()
+        stale = WireManufacturingProcess.objects.get(pk=process.pk)
+        self.service.approve_or_reject_step(process.pk, 'approve')
+
+        with mock.patch.object(self.service, '_get_process', return_value=stale):
+            with self.assertRaises(WorkflowConflict):
+                self.service.approve_or_reject_step(process.pk, 'approve')
+
+        process.refresh_from_db()
+        self.assertEqual(process.current_step, 2)
+        self.assertEqual(process.actions.filter(action_type='approve').count(), 1)
+
+    def test_bulk_actions_report_partial_failures(self):
+        first = self.service.start_process()
+        second = self.service.start_process()
+        completed = WireManufacturingProcess.objects.create(created_by=self.user, is_completed=True)
+
+        # savepoint + in_bulk + groups + 2 guarded updates + bulk_create + release
+        with self.assertNumQueries(7):
+            results = self.service.bulk_approve_or_reject([
+                {'process_id': first.pk, 'action': 'approve'},
+                {'process_id': second.pk, 'action': 'reject'},
+                {'process_id': completed.pk, 'action': 'approve'},
+                {'process_id': 0, 'action': 'approve'},
+                {'process_id': first.pk, 'action': 'approve'},
+            ])
+
+        self.assertEqual([r['success'] for r in results], [True, False, False, False, True])
+        self.assertEqual(results[4]['current_step'], 3)
+        self.assertEqual(ManufacturingProcessAction.objects.filter(process=first, action_type='approve').count(), 2)
+
+
+class ManufacturingProcessInboxTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user(username='op', is_superuser=False)
+        self.user.groups.add(Group.objects.create(name='OP'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_current_actor_follows_transitions(self):
+        superuser = self.make_user()
+        service = ManufacturingWorkflowService(user=superuser)
+        process = service.start_process()
+        self.assertEqual(process.current_actor, 'QC')
+
+        service.approve_or_reject_step(process.pk, 'approve')
+        process.refresh_from_db()
+        self.assertEqual(process.current_actor, 'OP')
+
+    def test_existing_processes_are_backfilled(self):
+        waiting = WireManufacturingProcess.objects.create(stage='rawmaterial', current_step=2)
+        done = WireManufacturingProcess.objects.create(stage='checklist', current_step=2, is_completed=True)
+        # As rows created before the column was added.
+        WireManufacturingProcess.objects.update(current_actor='')
+        updated_at = WireManufacturingProcess.objects.get(pk=waiting.pk).updated_at
+
+        self.assertEqual(WireManufacturingProcess.objects.sync_current_actors(batch_size=1), 1)
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.current_actor, 'OP')
+        self.assertEqual(waiting.updated_at, updated_at)
+        self.assertEqual(WireManufacturingProcess.objects.get(pk=done.pk).current_actor, '')
+        self.assertEqual(list(WireManufacturingProcess.objects.actionable_by(['OP'])), [waiting])
+
+    def test_inbox_lists_only_actionable_processes(self):
+        waiting = WireManufacturingProcess.objects.create(stage='rawmaterial', current_step=2)
+        WireManufacturingProcess.objects.create(stage='production', current_step=5)
+        WireManufacturingProcess.objects.create(stage='rawmaterial', current_step=1)
+        WireManufacturingProcess.objects.create(stage='checklist', current_step=2, is_completed=True)
+
+        response = self.client.get(reverse('manufacturing-process-inbox'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn(waiting.pk, [p['id'] for p in response.data['results']])
+        self.assertEqual(response.data['counts'], {'rawmaterial': 1, 'production': 1})
+
+
+@override_settings(WIRE_GROUP_CACHE_TIMEOUT=60)
+class WireAuthorizationContextTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user(username='op', is_superuser=False)
+        self.op = Group.objects.create(name='OP')
+        self.user.groups.add(self.op)
+
+    def test_group_names_are_cached_across_requests(self):
+        self.assertTrue(WireAuthorizationContext.for_user(self.user).can_act_as('OP'))
+        with self.assertNumQueries(0):
+            auth = WireAuthorizationContext.for_user(self.user)
+        self.assertEqual(auth.primary_group, 'OP')
+        self.assertFalse(auth.can_act_as('QC'))
+
+    def test_membership_changes_invalidate_the_cache(self):
+        WireAuthorizationContext.for_user(self.user)
+        Group.objects.create(name='QC').user_set.add(self.user)
+        self.assertTrue(WireAuthorizationContext.for_user(self.user).can_act_as('QC'))
+
+        self.user.groups.remove(self.op)
+        self.assertFalse(WireAuthorizationContext.for_user(self.user).can_act_as('OP'))
+
+    def test_service_checks_use_the_context(self):
+        process = WireManufacturingProcess.objects.create(stage='rawmaterial', current_step=2)
+        auth = WireAuthorizationContext.for_user(self.user)
+        service = ManufacturingWorkflowService(user=self.user, auth=auth)
+        # savepoint + select + guarded update + action insert + release; no group queries
+        with self.assertNumQueries(5):
+            service.approve_or_reject_step(process.pk, 'approve')
+
+
+class FieldPolicyTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.machine = get_workflow_state_machine()
+
+    def test_operator_checklist_policy(self):
+        policy = self.machine.get_field_policy('devicechecklist', 'checklist', 2, 'OP')
+        self.assertIsNone(policy.check({'qc_tests_wire': [{'id': 1, 'operator_approval': True}]}))
+        self.assertEqual(policy.check({'description': 'x'}), "Operators can only modify 'qc_tests_wire' data.")
+        self.assertIsNotNone(policy.check({'qc_tests_wire': [{'id': 1, 'test_result': False}]}))
+
+    def test_qc_cannot_touch_operator_approval(self):
+        policy = self.machine.get_field_policy('devicechecklist', 'production', 6, 'QC')
+        self.assertIsNone(policy.check({'description': 'x', 'qc_tests_wire': [{'id': 1, 'description': 'ok'}]}))
+        self.assertIsNotNone(policy.check({'qc_tests_wire': [{'id': 1, 'operator_approval': False}]}))
+
+    def test_step_scoped_and_wildcard_policies(self):
+        self.assertIsNotNone(self.machine.get_field_policy('deviceproduction', 'production', 2, 'OP'))
+        self.assertIsNone(self.machine.get_field_policy('deviceproduction', 'production', 5, 'OP'))
+        self.assertIsNotNone(self.machine.get_field_policy('deviceproduct', 'product', 1, 'OP'))
+        self.assertIsNone(self.machine.get_field_policy('deviceproduct', 'product', 1, None, is_superuser=True))
+
+    def test_denied_groups_cannot_send_an_empty_payload(self):
+        policy = self.machine.get_field_policy('deviceproduct', 'product', 1, 'OP')
+        self.assertEqual(policy.check({}), "Only QC users can create or edit the final product form.")
+        self.assertIsNotNone(policy.check({'color': 'red'}))
+        self.assertIsNone(self.machine.get_field_policy('deviceproduct', 'product', 1, 'QC').check({}))
+
+    def test_operator_patch_is_limited_by_policy(self):
+        operator = self.make_user(username='op', is_superuser=False)
+        operator.groups.add(Group.objects.create(name='OP'))
+        checklist = DeviceChecklist.objects.create(**self.form_kwargs('CHK'))
+        WireManufacturingProcess.objects.create(stage='checklist', current_step=2, checklist=checklist)
+        client = APIClient()
+        client.force_authenticate(operator)
+        url = reverse('devicechecklist-detail', args=[checklist.pk])
+
+        response = client.patch(url, {'description': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = client.patch(url, {'qc_tests_wire': []}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class QcTestSyncTests(WireTestDataMixin, TestCase):
+    # checklist UPDATE + search index upsert + savepoint + SELECT tests
+    # + SELECT/DELETE removed tests (post_delete invalidates fragments) + bulk UPDATE + INSERT + release
+    EXPECTED_QUERIES = 9
+
+    def _sync(self, checklist, payload):
+        serializer = DeviceChecklistSerializer(checklist, data={'qc_tests_wire': payload}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def _patch_with_tests(self, count):
+        checklist = DeviceChecklist.objects.create(**self.form_kwargs('CHK'))
+        tests = QcTestWire.objects.bulk_create([
+            QcTestWire(content_object=checklist, description=f"test {i}") for i in range(count)
+        ])
+        ContentType.objects.get_for_model(DeviceChecklist)
+        # Keep all but the last test, change one, and add a new one.
+        payload = [{'id': t.pk, 'description': t.description} for t in tests[:-1]]
+        payload[0]['operator_approval'] = False
+        payload.append({'description': 'new test'})
+
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self._sync(checklist, payload)
+        return checklist, tests
+
+    def test_sync_applies_diff(self):
+        checklist, tests = self._patch_with_tests(3)
+        remaining = QcTestWire.objects.filter(object_id=checklist.pk).order_by('pk')
+        self.assertEqual([t.description for t in remaining], ['test 0', 'test 1', 'new test'])
+        self.assertFalse(remaining[0].operator_approval)
+        self.assertEqual(remaining[1].pk, tests[1].pk)
+
+    def test_sync_query_count_is_constant(self):
+        self._patch_with_tests(60)
+
+    def test_create_ignores_client_sent_test_ids(self):
+        process = WireManufacturingProcess.objects.create(created_by=self.make_user())
+        existing = QcTestWire.objects.create(content_object=DeviceChecklist.objects.create(**self.form_kwargs('CHK')))
+        serializer = DeviceChecklistSerializer(data={
+            'workflow_id': process.pk, **self.form_kwargs('CHK'),
+            'qc_tests_wire': [{'id': existing.pk, 'description': 'new test'}],
+        })
+        serializer.is_valid(raise_exception=True)
+        checklist = serializer.save()
+        created = checklist.qc_tests_wire.get()
+        self.assertNotEqual(created.pk, existing.pk)
+        self.assertEqual(created.description, 'new test')
+
+    def test_sync_is_scoped_to_content_type(self):
+        checklist = DeviceChecklist.objects.create(**self.form_kwargs('CHK'))
+        raw_material = DeviceRawMaterial.objects.create(**self.form_kwargs('RM'))
+        # Force both parents onto the same object_id so only the content type tells them apart.
+        DeviceRawMaterial.objects.filter(pk=raw_material.pk).update(id=checklist.pk)
+        raw_material.pk = checklist.pk
+        other = QcTestWire.objects.create(content_object=raw_material, description='raw material test')
+
+        self._sync(checklist, [])
+        self.assertTrue(QcTestWire.objects.filter(pk=other.pk).exists())
+
+
+class ProductionUpsertTests(WireTestDataMixin, TestCase):
+    def test_editing_one_row_keeps_other_rows_and_links(self):
+        production = DeviceProduction.objects.create(**self.form_kwargs('PROD'))
+        rows = Production.objects.bulk_create([
+            Production(device_production=production, input_spool_number=f"SP-{i}") for i in range(300)
+        ])
+        qc_test = ProductionExtruderQcTestWire.objects.create(production=rows[1])
+        rows[1].production_qc_test = qc_test
+        rows[1].save()
+        waste = ProductionWaste.objects.create(device_production=production, waste_type='scrap')
+
+        payload = {
+            'production': [{'id': row.pk} for row in rows],
+            'production_wastes': [{'id': waste.pk, 'waste_type': 'scrap'}],
+        }
+        payload['production'][0]['input_spool_number'] = 'SP-EDITED'
+        serializer = DeviceProductionSerializer(production, data=payload, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        # savepoint + form UPDATE + search index upsert + rows SELECT + rows bulk UPDATE
+        # + wastes SELECT + release
+        with self.assertNumQueries(7):
+            serializer.save()
+
+        self.assertEqual(Production.objects.filter(device_production=production).count(), 300)
+        self.assertEqual(Production.objects.get(pk=rows[0].pk).input_spool_number, 'SP-EDITED')
+        self.assertEqual(Production.objects.get(pk=rows[1].pk).production_qc_test, qc_test)
+
+    def test_missing_rows_are_deleted_and_new_rows_created(self):
+        production = DeviceProduction.objects.create(**self.form_kwargs('PROD'))
+        keep, drop = Production.objects.bulk_create([
+            Production(device_production=production, input_spool_number='keep'),
+            Production(device_production=production, input_spool_number='drop'),
+        ])
+        serializer = DeviceProductionSerializer(production, data={
+            'production': [{'id': keep.pk}, {'input_spool_number': 'new'}],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        numbers = set(Production.objects.filter(device_production=production).values_list('input_spool_number', flat=True))
+        self.assertEqual(numbers, {'keep', 'new'})
+        self.assertFalse(Production.objects.filter(pk=drop.pk).exists())
+
+
+class ProductionRowImportTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.operator = self.make_user(username='op', is_superuser=False)
+        self.operator.groups.add(Group.objects.create(name='OP'))
+        self.production = DeviceProduction.objects.create(**self.form_kwargs('PROD'))
+        WireManufacturingProcess.objects.create(stage='production', current_step=2, production=self.production)
+        self.client = APIClient()
+        self.client.force_authenticate(self.operator)
+        self.url = reverse('deviceproduction-import-rows', args=[self.production.pk])
+
+    def test_ndjson_rows_are_inserted_in_batches(self):
+        body = "\n".join(json.dumps({'input_spool_number': f"SP-{i}", 'output_tank_number': '3'}) for i in range(2500))
+        with mock.patch.object(ProductionRowImporter, 'chunk_size', 1000):
+            response = self.client.generic('POST', self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 2500)
+        self.assertEqual(self.production.production.count(), 2500)
+
+    def test_csv_errors_are_reported_per_line_and_rolled_back(self):
+        body = "input_spool_number,operator_name\nSP-1,\nSP-2,Jane\n"
+        response = self.client.generic('POST', self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        # The operator policy for this step only allows the production data fields.
+        self.assertEqual([e['line'] for e in response.data['errors']], [3])
+        self.assertEqual(self.production.production.count(), 0)
+
+
+class DeviceAuthorizationCreateTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.process = WireManufacturingProcess.objects.create(stage='license', current_step=1)
+        self.form_name = WireFormName.objects.create(name='Extruder', type_form='Authorizations')
+        ContentType.objects.get_for_model(FormExtruderSettings)
+        lookup_cache.tables()
+
+    def _payload(self, **overrides):
+        payload = {
+            'workflow_id': self.process.pk,
+            'form_name_id': self.form_name.pk,
+            'device_settings': {'insulation_thickness': 2.5},
+            'license_production': {'setup_license_number': 'SETUP-1'},
+            'packaging': {'packaging_type': 'Reel'},
+            'raw_material_specifications': [{'raw_material_type': f"type {i}"} for i in range(20)],
+            **self.form_kwargs('AUTH'),
+        }
+        payload.update(overrides)
+        return payload
+
+    def test_create_is_atomic_and_within_budget(self):
+        # process + groups + trace_code uniqueness (the form name comes from the
+        # lookup cache), then the 9 writes documented on perform_create, 3 nested
+        # savepoint pairs and the specs read for the response.
+        with self.assertNumQueries(19):
+            response = self.client.post(reverse('deviceauthorization-list'), self._payload(), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        authorization = DeviceAuthorization.objects.get(pk=response.data['id'])
+        self.assertIsInstance(authorization.device_settings, FormExtruderSettings)
+        self.assertEqual(authorization.raw_material_specifications.count(), 20)
+        self.process.refresh_from_db()
+        self.assertEqual(self.process.authorization, authorization)
+        self.assertEqual(response.data['workflow_id'], self.process.pk)
+
+    def test_invalid_settings_create_nothing(self):
+        response = self.client.post(
+            reverse('deviceauthorization-list'),
+            self._payload(device_settings={'insulation_thickness': 'thick'}),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DeviceAuthorization.objects.exists())
+        self.process.refresh_from_db()
+        self.assertIsNone(self.process.authorization)
+
+
+class DeviceTypeRegistryTests(WireTestDataMixin, TestCase):
+    def test_lookups(self):
+        extruder = device_types.by_name('Extruder')
+        self.assertIs(device_types.for_model(FormExtruderSettings), extruder)
+        self.assertIs(device_types.for_model(ProductionExtruderQcTestWire()), extruder)
+        self.assertEqual(device_types.for_model(FormRadiantSettings).name, 'Radiant')
+        self.assertIsNone(device_types.by_name('Unknown'))
+
+    def test_settings_are_batch_prefetched_per_type(self):
+        for i in range(20):
+            authorization = DeviceAuthorization.objects.create(**self.form_kwargs('AUTH'))
+            model = FormExtruderSettings if i % 2 else FormRadiantSettings
+            authorization.device_settings = model.objects.create(authorization=authorization)
+            authorization.save()
+
+        # authorizations + one query per settings type
+        with self.assertNumQueries(3):
+            authorizations = list(DeviceAuthorization.objects.prefetch_related('device_settings'))
+        field = DeviceSettingsRelatedField(read_only=True)
+        with self.assertNumQueries(0):
+            data = [field.to_representation(a.device_settings) for a in authorizations]
+        self.assertEqual(len(data), 20)
+
+
+class IdempotencyKeyTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retried_action_is_applied_once(self):
+        process = ManufacturingWorkflowService(user=self.user).start_process()
+        url = reverse('manufacturing-process-action', args=[process.pk])
+        first = self.client.post(url, {'action': 'approve'}, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        retry = self.client.post(url, {'action': 'approve'}, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['current_step'], first.data['current_step'])
+        process.refresh_from_db()
+        self.assertEqual(process.current_step, 2)
+        self.assertEqual(process.actions.filter(action_type='approve').count(), 1)
+
+    def test_retried_form_create_returns_the_same_form(self):
+        process = WireManufacturingProcess.objects.create(stage='rawmaterial', current_step=1)
+        payload = {'workflow_id': process.pk, **self.form_kwargs('RM')}
+        url = reverse('devicerawmaterial-list')
+        first = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='rm-1')
+        retry = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='rm-1')
+
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json()['id'], first.data['id'])
+        self.assertEqual(DeviceRawMaterial.objects.count(), 1)
+
+    def test_key_reuse_and_failures(self):
+        process = ManufacturingWorkflowService(user=self.user).start_process()
+        url = reverse('manufacturing-process-action', args=[process.pk])
+        self.client.post(url, {'action': 'approve'}, format='json', HTTP_IDEMPOTENCY_KEY='k-2')
+        reused = self.client.post(url, {'action': 'reject', 'comment': 'x'}, format='json', HTTP_IDEMPOTENCY_KEY='k-2')
+        self.assertEqual(reused.status_code, 422)
+
+        # A failed attempt does not hold on to its key.
+        invalid = self.client.post(url, {'action': 'bogus'}, format='json', HTTP_IDEMPOTENCY_KEY='k-3')
+        self.assertEqual(invalid.status_code, 400)
+        self.assertFalse(IdempotencyRecord.objects.filter(key='k-3').exists())
+
+
+class RawMaterialBatchCreateTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.process = WireManufacturingProcess.objects.create(stage='rawmaterial', current_step=1)
+        self.url = reverse('devicerawmaterial-batch-create')
+
+    def _payload(self, count):
+        return {
+            'workflow_id': self.process.pk,
+            'forms': [
+                {**self.form_kwargs('RM'), 'qc_tests_wire': [{'description': 'a'}, {'description': 'b'}]}
+                for _ in range(count)
+            ],
+        }
+
+    def test_batch_is_created_with_constant_queries(self):
+        ContentType.objects.get_for_model(DeviceRawMaterial)
+        # process + groups + trace_code check, savepoint, 2 bulk inserts,
+        # search index upsert, release, then forms and tests for the response.
+        with self.assertNumQueries(10):
+            response = self.client.post(self.url, self._payload(20), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(len(response.data[0]['qc_tests_wire']), 2)
+        self.assertEqual(response.data[0]['workflow_id'], self.process.pk)
+        self.assertEqual(self.process.raw_materials.count(), 20)
+        self.assertEqual(QcTestWire.objects.filter(object_id__in=self.process.raw_materials.values('pk')).count(), 40)
+
+    def test_duplicate_trace_codes_create_nothing(self):
+        payload = self._payload(2)
+        payload['forms'][1]['trace_code'] = payload['forms'][0]['trace_code']
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DeviceRawMaterial.objects.exists())
+
+    def test_items_cannot_name_another_process(self):
+        other = WireManufacturingProcess.objects.create()
+        payload = self._payload(2)
+        payload['forms'][0]['manufacturing_process'] = None
+        payload['forms'][1]['manufacturing_process'] = other.pk
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.process.raw_materials.count(), 2)
+
+    def test_wrong_stage_is_rejected(self):
+        self.process.stage = 'license'
+        self.process.save()
+        response = self.client.post(self.url, self._payload(1), format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class AuthorizationUpdateTests(WireTestDataMixin, TestCase):
+    def test_patch_returns_the_written_nested_rows(self):
+        user = self.make_user()
+        client = APIClient()
+        client.force_authenticate(user)
+        process = self.make_process(user)
+        Packaging.objects.filter(authorization=process.authorization).delete()
+
+        response = client.patch(
+            reverse('deviceauthorization-detail', args=[process.authorization_id]),
+            {'license_production': {'setup_license_number': 'SETUP-2'}, 'packaging': {'packaging_type': 'Drum'}},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['license_production']['setup_license_number'], 'SETUP-2')
+        self.assertEqual(response.data['packaging']['packaging_type'], 'Drum')
+
+
+class FormListQueryCountTests(WireTestDataMixin, TestCase):
+    """Every form list costs the same number of queries whatever the page size."""
+    # count + page + one query per prefetched relation (and per GFK content type).
+    expected_queries = {
+        'devicerawmaterial-list': 3,
+        'deviceauthorization-list': 4,
+        'devicechecklist-list': 3,
+        'deviceproduction-list': 5,
+        'deviceproduct-list': 2,
+    }
+
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        form_name = WireFormName.objects.create(name='Extruder', type_form='Authorizations')
+        for _ in range(6):
+            process = self.make_process(self.user, children=2)
+            process.authorization.form_name = form_name
+            process.authorization.save()
+            process.product_final = DeviceProduct.objects.create(**self.form_kwargs('PRD'))
+            process.save()
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        for url_name, expected in self.expected_queries.items():
+            for page_size in (1, 6):
+                with self.subTest(url_name, page_size=page_size), self.assertNumQueries(expected):
+                    response = self.client.get(reverse(url_name), {'page_size': page_size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+                self.assertIsNotNone(response.data['results'][0]['stage'])
+
+    def test_retrieve_uses_the_same_plan(self):
+        process = WireManufacturingProcess.objects.first()
+        # The version stamp check replaces the count query of the list.
+        with self.assertNumQueries(self.expected_queries['deviceauthorization-list']):
+            response = self.client.get(reverse('deviceauthorization-detail', args=[process.authorization_id]))
+        self.assertEqual(response.data['workflow_id'], process.pk)
+
+    def test_cursor_mode_skips_the_count(self):
+        url = reverse('devicerawmaterial-list')
+        expected = self.expected_queries['devicerawmaterial-list'] - 1
+        seen = []
+        response = None
+        next_url = f"{url}?pagination=cursor&page_size=5"
+        while next_url:
+            with self.assertNumQueries(expected):
+                response = self.client.get(next_url)
+            self.assertNotIn('count', response.data)
+            seen += [row['id'] for row in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(seen, sorted(DeviceRawMaterial.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_cursor_mode_approximate_count(self):
+        response = self.client.get(reverse('devicechecklist-list'), {'pagination': 'cursor', 'count': 'approximate'})
+        self.assertEqual(response.data['approximate_count'], 6)
+
+
+class FormSearchTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('wire-form-search')
+
+    def test_finds_forms_of_every_type_in_one_query(self):
+        process = self.make_process(self.user, children=1)
+        authorization = process.authorization
+        authorization.license_number = 'LIC-77'
+        authorization.save()
+        spec = authorization.raw_material_specifications.get()
+        spec.trace_code = 'LIC-SPEC'
+        spec.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'q': 'lic-'})
+        results = {(r['form_type'], r['object_id']): r for r in response.data['results']}
+        self.assertEqual(set(results), {('deviceauthorization', authorization.pk), ('rawmaterialspecifications', spec.pk)})
+        self.assertEqual({r['workflow_id'] for r in results.values()}, {process.pk})
+        # Codes are returned as entered, not as matched.
+        self.assertEqual(results[('deviceauthorization', authorization.pk)]['license_number'], 'LIC-77')
+
+        response = self.client.get(self.url, {'q': 'rm-doc'})
+        self.assertEqual(
+            [(r['form_type'], r['workflow_id']) for r in response.data['results']],
+            [('devicerawmaterial', process.pk)],
+        )
+
+    def test_index_follows_saves_and_deletes(self):
+        checklist = DeviceChecklist.objects.create(**self.form_kwargs('CHK'))
+        checklist.trace_code = 'NEW-TRACE'
+        checklist.save()
+        self.assertEqual(search_forms('new-trace')[0]['object_id'], checklist.pk)
+        self.assertFalse(search_forms('chk-trace'))
+        checklist.delete()
+        self.assertFalse(WireFormSearchEntry.objects.filter(form_type='devicechecklist').exists())
+
+    def test_bulk_created_specs_are_indexed(self):
+        process = WireManufacturingProcess.objects.create(stage='license', current_step=1)
+        response = self.client.post(reverse('deviceauthorization-list'), {
+            'workflow_id': process.pk, **self.form_kwargs('AUTH'),
+            'raw_material_specifications': [{'trace_code': 'SPEC-1'}, {'trace_code': 'SPEC-2'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([r['workflow_id'] for r in search_forms('spec-')], [process.pk, process.pk])
+
+    def test_short_query_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'a'}).status_code, 400)
+
+
+class LookupCacheTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('wire-lookup-bootstrap')
+        self.form_name = WireFormName.objects.create(name='Extruder', type_form='Authorizations')
+        Material.objects.create(name='Copper')
+
+    def test_bootstrap_is_cached_and_revalidated_by_etag(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['wire_form_names'][0]['name'], 'Extruder')
+        self.assertEqual(len(response.data['materials']), 1)
+
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.data, response.data)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_bump_the_version(self):
+        etag = self.client.get(self.url)['ETag']
+        Material.objects.create(name='Aluminium')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['materials']), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_form_name_is_resolved_from_the_cache(self):
+        lookup_cache.tables()
+        field = DeviceChecklistSerializer().fields['form_name']
+        with self.assertNumQueries(0):
+            self.assertEqual(field.to_internal_value(str(self.form_name.pk)), self.form_name)
+        with self.assertRaises(ValidationError):
+            field.to_internal_value(0)
+
+    def test_ids_missing_from_the_cache_fall_back_to_the_database(self):
+        lookup_cache.tables()
+        # bulk_create skips the signals, like a row added through another worker.
+        added, = WireFormName.objects.bulk_create([WireFormName(name='Drawing', type_form='Checklist')])
+        field = DeviceChecklistSerializer().fields['form_name']
+        with self.assertNumQueries(1):
+            self.assertEqual(field.to_internal_value(added.pk), added)
+
+
+class FragmentCacheTests(WireTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        fragment_cache.clear()
+        self.user = self.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.process = self.make_process(self.user, children=2)
+        self.url = reverse('manufacturing-process-detail', args=[self.process.pk])
+
+    def test_repeated_reads_hit_the_cache(self):
+        first = self.client.get(self.url)
+        # two raw materials + authorization + checklist + production
+        self.assertEqual(fragment_cache.stats()['misses'], 5)
+        second = self.client.get(self.url)
+        self.assertEqual(fragment_cache.stats()['hits'], 5)
+        self.assertEqual(second.data, first.data)
+
+    def test_nested_writes_invalidate_the_form(self):
+        self.client.get(self.url)
+        test = self.process.checklist.qc_tests_wire.first()
+        test.description = 'retested'
+        test.save()
+        Packaging.objects.filter(authorization=self.process.authorization).get().delete()
+
+        response = self.client.get(self.url)
+        self.assertIn('retested', [t['description'] for t in response.data['checklist']['qc_tests_wire']])
+        self.assertIsNone(response.data['authorization']['packaging'])
+        # Only the two raw materials and the production were reused.
+        self.assertEqual(fragment_cache.stats()['hits'], 3)
+
+    def test_evicted_versions_do_not_revive_old_entries(self):
+        self.client.get(self.url)
+        checklist = self.process.checklist
+        fragment_cache.invalidate(DeviceChecklist, checklist.pk)
+        # The shared cache dropping the bumped counter must not bring back the first fragment.
+        cache.delete(f"wire:fragments:devicechecklist:{checklist.pk}")
+        self.client.get(self.url)
+        self.assertEqual(fragment_cache.stats()['misses'], 6)
+
+    def test_transitions_change_the_embedded_stage(self):
+        self.client.get(self.url)
+        ManufacturingWorkflowService(user=self.user).approve_or_reject_step(self.process.pk, 'approve')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['checklist']['current_step'], 2)
+
+    @override_settings(WIRE_FRAGMENT_CACHE_SIZE=2)
+    def test_memory_is_bounded(self):
+        self.client.get(self.url)
+        stats = fragment_cache.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['evictions'], 3)
@@ -8,11 +8,14 @@ from .views import (
     MaterialViewSet,
     CoatingMaterialViewSet,
     WireFormNameViewSet,
+    LookupBootstrapView,
     # Forms
     DeviceRawMaterialViewSet, DeviceAuthorizationViewSet, DeviceChecklistViewSet,
-    DeviceProductionViewSet, DeviceProductViewSet,
+    DeviceProductionViewSet, DeviceProductViewSet, FormSearchView,
     # Master Workflow
-    StartManufacturingProcessView, ManufacturingProcessDetailView, PerformProcessActionView
+    StartManufacturingProcessView, ManufacturingProcessListView, ManufacturingProcessInboxView,
+    ManufacturingProcessDetailView, ProcessActionListView,
+    PerformProcessActionView, BulkProcessActionView
 )
 
 # Router for all ViewSets
@@ -36,10 +39,16 @@ router.register(r'forms/products', DeviceProductViewSet, basename='deviceproduct
 urlpatterns = [
     # Include all endpoints from the router
     path('', include(router.urls)),
+    path('lookups/bootstrap/', LookupBootstrapView.as_view(), name='wire-lookup-bootstrap'),
+    path('forms/search/', FormSearchView.as_view(), name='wire-form-search'),
     
     # Master Workflow URLs
+    path('workflow/process/', ManufacturingProcessListView.as_view(), name='manufacturing-process-list'),
     path('workflow/process/start/', StartManufacturingProcessView.as_view(), name='manufacturing-process-start'),
+    path('workflow/process/inbox/', ManufacturingProcessInboxView.as_view(), name='manufacturing-process-inbox'),
+    path('workflow/process/actions/', BulkProcessActionView.as_view(), name='manufacturing-process-bulk-action'),
     path('workflow/process/<int:pk>/', ManufacturingProcessDetailView.as_view(), name='manufacturing-process-detail'),
     path('workflow/process/<int:pk>/action/', PerformProcessActionView.as_view(), name='manufacturing-process-action'),
+    path('workflow/process/<int:pk>/actions/', ProcessActionListView.as_view(), name='manufacturing-process-actions'),
 ]
 
@@ -1,5 +1,5 @@
 # apps/wire/views.py
-from rest_framework import viewsets, mixins, serializers
+from rest_framework import viewsets, mixins, serializers, generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.decorators import action
@@ -7,13 +7,15 @@ from rest_framework.response import Response
 from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiExample
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count
 from rest_framework.exceptions import ValidationError
 
 
 # Correctly and explicitly import all necessary models from their specific files
 from .models import (
     DeviceRawMaterial, DeviceAuthorization, DeviceChecklist, DeviceProduction, DeviceProduct,
-    WireManufacturingProcess
+    WireManufacturingProcess, ManufacturingProcessAction, shared_row_stamps
 )
 # Import lookup models from their specific location
 from .dir_classes.wire_abstract_class import (
@@ -23,17 +25,25 @@ from .dir_classes.wire_abstract_class import (
 from .serializers import (
     UnsharedFieldStructureSerializer, QcTestWireDefinitionSerializer,
     MaterialSerializer, CoatingMaterialSerializer, WireFormNameSerializer,
-    DeviceRawMaterialSerializer, DeviceAuthorizationSerializer, DeviceChecklistSerializer,
+    DeviceRawMaterialSerializer, DeviceRawMaterialBatchSerializer, DeviceAuthorizationSerializer, DeviceChecklistSerializer,
     DeviceProductionSerializer, DeviceProductSerializer, WireManufacturingProcessSerializer,
-    FormExtruderSettingsSerializer, FormFiberWeaverSettingsSerializer, FormRadiantSettingsSerializer, FormShieldWeaverSettingsSerializer
+    WireManufacturingProcessSummarySerializer, ManufacturingProcessActionSerializer,
+    device_types,
 )
-from .pagination import CustomPagination
+from .pagination import CustomPagination, ProcessCursorPagination, ProcessActionCursorPagination, SelectablePagination
 from .services import ManufacturingWorkflowService
-from .permissions import IsSuperUser, CanCreateFormForStage, CanUpdateFormForStage
+from .permissions import IsSuperUser, CanCreateFormForStage, CanUpdateFormForStage, CanImportProductionRows
+from .ingestion import ProductionRowImporter
+from .authorization import WireAuthorizationContext
+from .idempotency import IdempotencyMixin
+from .search import search_forms
+from .lookups import lookup_cache
+from .conditional import Validators, make_etag
+from .snapshots import snapshot_etag, snapshot_response, store_snapshot, stored_snapshot
 
 # --- Lookups ViewSets (Restored) ---
 ###
-from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, PolymorphicProxySerializer
 
 # @extend_schema(tags=['Wire - Lookups'])
 # class UnsharedFieldStructureViewSet(viewsets.ModelViewSet):
@@ -41,6 +51,51 @@ from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParamete
 #     serializer_class = UnsharedFieldStructureSerializer
 #     permission_classes = [IsAuthenticated]
 #     pagination_class = CustomPagination
+def get_sparse_options(request, serializer_class):
+    """
+    Reads ?fields= and ?expand= (comma separated) into serializer kwargs for
+    SparseFieldsetMixin. Missing parameters are left out, keeping the full tree.
+    """
+    options = {}
+    for param in ('fields', 'expand'):
+        value = request.query_params.get(param)
+        if value is not None:
+            options[param] = sorted({name.strip() for name in value.split(',') if name.strip()})
+    unknown = set(options.get('expand', ())) - set(serializer_class.expandable_fields)
+    if unknown:
+        raise ValidationError({
+            'expand': f"Cannot expand {', '.join(sorted(unknown))}. "
+                      f"Expandable: {', '.join(serializer_class.expandable_fields) or 'none'}."
+        })
+    return options
+
+@extend_schema(tags=['Wire - Lookups'])
+class LookupBootstrapView(APIView):
+    """
+    Every lookup table in one response, built once per lookup version and
+    served with an ETag so unchanged clients get a 304.
+    """
+    permission_classes = [IsAuthenticated]
+    lookup_serializers = {
+        'materials': MaterialSerializer,
+        'coating_materials': CoatingMaterialSerializer,
+        'wire_form_names': WireFormNameSerializer,
+        'qc_test_wire_definitions': QcTestWireDefinitionSerializer,
+        'unshared_field_structures': UnsharedFieldStructureSerializer,
+    }
+
+    def _serialize(self, tables):
+        return {name: serializer(tables[name], many=True).data for name, serializer in self.lookup_serializers.items()}
+
+    @extend_schema(summary="Get all lookup tables in one call", responses={200: None, 304: None})
+    def get(self, request, *args, **kwargs):
+        version, payload = lookup_cache.memoize('bootstrap', self._serialize)
+        validators = Validators(f'"wire-lookups-{version}"')
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        return validators.apply(Response({"version": version, **payload}))
+
 @extend_schema(tags=['Wire - Lookups'])
 class UnsharedFieldStructureViewSet(viewsets.ModelViewSet):
     queryset = UnsharedFieldStructure.objects.order_by('pk').all()
@@ -193,13 +248,65 @@ class WireFormNameViewSet(viewsets.ModelViewSet):
 #     # The conflicting create method has been removed. 
 #     # The default behavior from ModelViewSet will now be used, 
 #     # which correctly calls the custom create method in the serializer.
-class BaseWorkflowViewSet(viewsets.ModelViewSet):
+class BaseWorkflowViewSet(IdempotencyMixin, viewsets.ModelViewSet):
     """
     Base ViewSet for forms that are part of the master workflow.
     It links form creation/updates to the master process.
+    A create sent with an Idempotency-Key header is only applied once.
     """
-    pagination_class = CustomPagination
+    pagination_class = SelectablePagination
+    idempotent_actions = ('create',)
+    # Read actions whose response serializes rows loaded through get_queryset().
+    # Writes are left out: nested rows they write would be rendered from
+    # relation caches filled before the write.
+    eager_loading_actions = ('list', 'retrieve')
+
+    # Read actions that accept ?fields= and ?expand= (see SparseFieldsetMixin).
+    sparse_actions = ('list', 'retrieve')
+
+    # values() paths of shared rows the representation embeds, for the ETag.
+    shared_stamps = ()
+
+    def get_sparse_options(self):
+        if self.action not in self.sparse_actions:
+            return {}
+        return get_sparse_options(self.request, self.get_serializer_class())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_sparse_options())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.eager_loading_actions:
+            queryset = self.get_serializer_class().setup_eager_loading(queryset, **self.get_sparse_options())
+        return queryset
     
+    def get_validators(self):
+        """
+        Conditional GET validators for the requested form, from its own
+        updated_at, its process's (stage and step are embedded) and the
+        `shared_stamps`, or None if the form does not exist.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        stamps = self.queryset.model.objects.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values(
+            'pk', 'updated_at', 'manufacturing_process__pk', 'manufacturing_process__updated_at', *self.shared_stamps,
+        ).first()
+        if stamps is None:
+            return None
+        return Validators(make_etag(
+            self.queryset.model._meta.model_name, sorted(stamps.items()), self.get_sparse_options(),
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        return validators.apply(super().retrieve(request, *args, **kwargs))
+
     def get_permissions(self):
         if self.action == 'create':
             self.permission_classes = [CanCreateFormForStage]
@@ -234,7 +341,7 @@ class BaseWorkflowViewSet(viewsets.ModelViewSet):
 class DeviceRawMaterialViewSet(BaseWorkflowViewSet):
     queryset = DeviceRawMaterial.objects.all()
     serializer_class = DeviceRawMaterialSerializer
-    pagination_class = CustomPagination
+    pagination_class = SelectablePagination
 
     @extend_schema(
         summary="Create a new raw material form",
@@ -289,9 +396,52 @@ class DeviceRawMaterialViewSet(BaseWorkflowViewSet):
     def partial_update(self, request, *args, **kwargs):
         return super().partial_update(request, *args, **kwargs)
 
+    idempotent_actions = ('create', 'batch_create')
+
+    def get_permissions(self):
+        if self.action == 'batch_create':
+            # The payload carries one workflow_id, so the stage/group check runs once.
+            return [CanCreateFormForStage()]
+        return super().get_permissions()
+
+    @extend_schema(
+        summary="Create several raw material forms for one process",
+        request=DeviceRawMaterialBatchSerializer,
+        responses={201: DeviceRawMaterialSerializer(many=True)},
+        examples=[
+            OpenApiExample(
+                'Create Raw Materials',
+                value={
+                    "workflow_id": 1,
+                    "forms": [
+                        {
+                            "document_code": "RM-2025-001",
+                            "trace_date": "2025-09-16",
+                            "trace_code": "TRACE-RM-001",
+                            "qc_tests_wire": [{"test_definition": 1, "test_result": True}]
+                        },
+                        {
+                            "document_code": "RM-2025-002",
+                            "trace_date": "2025-09-16",
+                            "trace_code": "TRACE-RM-002"
+                        }
+                    ]
+                }
+            )
+        ]
+    )
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch_create(self, request):
+        serializer = DeviceRawMaterialBatchSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        forms = serializer.save()
+        forms = DeviceRawMaterialSerializer.setup_eager_loading(
+            DeviceRawMaterial.objects.filter(pk__in=[form.pk for form in forms]).order_by('pk')
+        )
+        return Response(DeviceRawMaterialSerializer(forms, many=True).data, status=status.HTTP_201_CREATED)
+
 
 ###
-from django.contrib.contenttypes.models import ContentType
 from .dir_classes.device_settings import (
     FormExtruderSettings, FormRadiantSettings, 
     FormFiberWeaverSettings, FormShieldWeaverSettings
@@ -300,7 +450,8 @@ from .dir_classes.device_settings import (
 class DeviceAuthorizationViewSet(BaseWorkflowViewSet):
     queryset = DeviceAuthorization.objects.all()
     serializer_class = DeviceAuthorizationSerializer
-    pagination_class = CustomPagination
+    pagination_class = SelectablePagination
+    shared_stamps = shared_row_stamps()
 
     
     @extend_schema(
@@ -353,63 +504,41 @@ class DeviceAuthorizationViewSet(BaseWorkflowViewSet):
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        # Save the DeviceAuthorization instance
-        authorization = serializer.save()
-
-        # Get form_name and settings data
-        form_name = None
-        if authorization.form_name:
-            form_name = authorization.form_name.name
-        elif 'form_name_id' in self.request.data:
-            try:
-                from .dir_classes.wire_abstract_class import WireFormName
-                form_name_obj = WireFormName.objects.get(id=self.request.data['form_name_id'])
-                form_name = form_name_obj.name
-            except WireFormName.DoesNotExist:
-                pass
+        """
+        Creates the authorization, its nested forms, the process link and the
+        device settings as one atomic unit; any failure rolls everything back.
 
+        Query budget once the payload is validated (plus savepoints):
+          1 INSERT authorization      1 UPDATE process link
+          1 INSERT license_production 1 INSERT packaging
+          1 bulk INSERT raw_material_specifications
+          1 INSERT device settings    1 UPDATE authorization settings link
+          2 search index upserts (authorization, specs)
+        """
+        # form_name_id is already resolved to a WireFormName during validation.
+        form_name = serializer.validated_data.get('form_name')
         settings_data = self.request.data.get('device_settings', {})
 
-        if not settings_data or not form_name:
-            return
+        # Validate the settings up front so a bad payload never touches the database.
+        settings_serializer = None
+        device_type = device_types.by_name(form_name.name) if form_name else None
+        if settings_data and device_type:
+            settings_serializer = device_type.settings_serializer(data=settings_data)
+            settings_serializer.is_valid(raise_exception=True)
 
-        settings_instance = None
-        try:
-            # Create the appropriate settings model
-            if form_name == 'Extruder':
-                settings_serializer = FormExtruderSettingsSerializer(data=settings_data)
-                if settings_serializer.is_valid(raise_exception=True):
-                    settings_instance = settings_serializer.save(authorization=authorization)
-                    
-            elif form_name == 'Radiant':
-                settings_serializer = FormRadiantSettingsSerializer(data=settings_data)
-                if settings_serializer.is_valid(raise_exception=True):
-                    settings_instance = settings_serializer.save(authorization=authorization)
-                    
-            elif form_name == 'FiberWeaver':
-                settings_serializer = FormFiberWeaverSettingsSerializer(data=settings_data)
-                if settings_serializer.is_valid(raise_exception=True):
-                    settings_instance = settings_serializer.save(authorization=authorization)
-                    
-            elif form_name == 'ShieldWeaver':
-                settings_serializer = FormShieldWeaverSettingsSerializer(data=settings_data)
-                if settings_serializer.is_valid(raise_exception=True):
-                    settings_instance = settings_serializer.save(authorization=authorization)
+        with transaction.atomic():
+            authorization = serializer.save()
+            if not settings_serializer:
+                return
+
+            try:
+                settings_instance = settings_serializer.save(authorization=authorization)
+            except Exception as e:
+                raise ValidationError(f"Failed to create device settings: {str(e)}")
 
             # Set up the GenericForeignKey relationship
-            if settings_instance:
-                content_type = ContentType.objects.get_for_model(settings_instance)
-                authorization.settings_content_type = content_type
-                authorization.settings_object_id = settings_instance.id
-                authorization.save()
-                
-        except ValidationError as e:
-            # Clean up authorization if settings creation fails
-            authorization.delete()
-            raise e
-        except Exception as e:
-            authorization.delete()
-            raise ValidationError(f"Failed to create device settings: {str(e)}")
+            authorization.device_settings = settings_instance
+            authorization.save(update_fields=['settings_content_type', 'settings_object_id'])
     
     def handle_exception(self, exc):
         """Enhanced error handling for authorization creation."""
@@ -432,7 +561,7 @@ class DeviceAuthorizationViewSet(BaseWorkflowViewSet):
 class DeviceChecklistViewSet(BaseWorkflowViewSet):
     queryset = DeviceChecklist.objects.all()
     serializer_class = DeviceChecklistSerializer
-    pagination_class = CustomPagination
+    pagination_class = SelectablePagination
 
     @extend_schema(
         summary="Create a device checklist",
@@ -474,7 +603,7 @@ class DeviceChecklistViewSet(BaseWorkflowViewSet):
 class DeviceProductionViewSet(BaseWorkflowViewSet):
     queryset = DeviceProduction.objects.all()
     serializer_class = DeviceProductionSerializer
-    pagination_class = CustomPagination
+    pagination_class = SelectablePagination
 
     @extend_schema(
         summary="Create a production form",
@@ -515,6 +644,33 @@ class DeviceProductionViewSet(BaseWorkflowViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    def get_permissions(self):
+        if self.action == 'import_rows':
+            return [CanImportProductionRows()]
+        return super().get_permissions()
+
+    @extend_schema(
+        summary="Stream production spool rows into a production form",
+        description=(
+            "Send the body as NDJSON (application/x-ndjson, one object per line) or CSV "
+            "(text/csv, header row of Production field names). Rows are validated like the "
+            "nested 'production' list and inserted in batches. If any line fails, nothing is "
+            "inserted and the per-line errors are returned."
+        ),
+        request={'application/x-ndjson': str, 'text/csv': str},
+        responses={201: None, 400: None},
+    )
+    @action(detail=True, methods=['post'], url_path='production-rows/import')
+    def import_rows(self, request, pk=None):
+        device_production = self.get_object()
+        importer = ProductionRowImporter(device_production, field_policy=getattr(self, 'field_policy', None))
+        stream = request.stream
+        succeeded = importer.run(stream, request.content_type) if stream is not None else True
+        return Response(
+            {"created": importer.created, "error_count": importer.error_count, "errors": importer.errors},
+            status=status.HTTP_201_CREATED if succeeded else status.HTTP_400_BAD_REQUEST,
+        )
+
 # @extend_schema(tags=['Wire - Forms'])
 # class DeviceProductViewSet(BaseWorkflowViewSet):
 #     queryset = DeviceProduct.objects.all()
@@ -524,7 +680,7 @@ class DeviceProductionViewSet(BaseWorkflowViewSet):
 class DeviceProductViewSet(BaseWorkflowViewSet):
     queryset = DeviceProduct.objects.all()
     serializer_class = DeviceProductSerializer
-    pagination_class = CustomPagination
+    pagination_class = SelectablePagination
 
     @extend_schema(
         summary="Create a final product form",
@@ -565,6 +721,191 @@ class StartManufacturingProcessView(APIView):
         serializer = WireManufacturingProcessSerializer(process)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+MAX_BATCH_IDS = 200
+
+class ProcessListFilterSerializer(serializers.Serializer):
+    stage = serializers.CharField(required=False)
+    current_step = serializers.IntegerField(required=False)
+    current_actor = serializers.CharField(required=False)
+    is_completed = serializers.BooleanField(required=False, allow_null=True, default=None)
+    is_rejected = serializers.BooleanField(required=False, allow_null=True, default=None)
+    created_by = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    updated_after = serializers.DateTimeField(required=False)
+    updated_before = serializers.DateTimeField(required=False)
+    ids = serializers.CharField(
+        required=False,
+        help_text=f"Comma-separated process ids (at most {MAX_BATCH_IDS}). Returns exactly those processes, unpaginated.",
+    )
+    representation = serializers.ChoiceField(
+        choices=['summary', 'full'], default='summary',
+        help_text="With ids: 'full' returns each process's whole tree, as the detail endpoint does.",
+    )
+
+    # Maps each query parameter to the ORM lookup it filters on.
+    lookups = {
+        'stage': 'stage',
+        'current_step': 'current_step',
+        'current_actor': 'current_actor',
+        'is_completed': 'is_completed',
+        'is_rejected': 'is_rejected',
+        'created_by': 'created_by_id',
+        'created_after': 'created_at__gte',
+        'created_before': 'created_at__lt',
+        'updated_after': 'updated_at__gte',
+        'updated_before': 'updated_at__lt',
+        'ids': 'pk__in',
+    }
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk.strip()))
+        except ValueError:
+            raise serializers.ValidationError("Expected comma-separated integer ids.")
+        if not ids:
+            raise serializers.ValidationError("At least one id is required.")
+        if len(ids) > MAX_BATCH_IDS:
+            raise serializers.ValidationError(f"At most {MAX_BATCH_IDS} ids can be fetched at once.")
+        return ids
+
+    def get_filters(self):
+        return {
+            self.lookups[name]: value
+            for name, value in self.validated_data.items()
+            if name in self.lookups and value is not None
+        }
+
+class ProcessPageSerializer(serializers.Serializer):
+    """A keyset page of process summaries (the default list response)."""
+    next = serializers.URLField(allow_null=True)
+    previous = serializers.URLField(allow_null=True)
+    results = WireManufacturingProcessSummarySerializer(many=True)
+    approximate_count = serializers.IntegerField(required=False)
+
+class ProcessBatchSummarySerializer(serializers.Serializer):
+    """Response to ?ids=: the requested processes as summaries, unpaginated."""
+    results = WireManufacturingProcessSummarySerializer(many=True)
+    missing = serializers.ListField(child=serializers.IntegerField())
+
+class ProcessBatchFullSerializer(serializers.Serializer):
+    """Response to ?ids=...&representation=full: whole trees, unpaginated."""
+    results = WireManufacturingProcessSerializer(many=True)
+    missing = serializers.ListField(child=serializers.IntegerField())
+
+@extend_schema(tags=['Wire - Master Workflow'])
+class ManufacturingProcessListView(generics.ListAPIView):
+    """List master processes with filters and keyset pagination on (updated_at, id)."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = WireManufacturingProcessSummarySerializer
+    pagination_class = ProcessCursorPagination
+
+    def get_filters(self):
+        if not hasattr(self, '_filters'):
+            self._filters = ProcessListFilterSerializer(data=self.request.query_params)
+            self._filters.is_valid(raise_exception=True)
+        return self._filters
+
+    def get_queryset(self):
+        return WireManufacturingProcess.objects.filter(**self.get_filters().get_filters())
+
+    @extend_schema(
+        summary="List master manufacturing processes",
+        description=(
+            "Pass ?ids=1,2,3 to fetch specific processes in one request, in the order given; ids that do "
+            "not exist (or fail the other filters) are listed under 'missing'. Add ?representation=full "
+            "for whole trees, loaded with one shared prefetch plan; ?fields= and ?expand= then work as on "
+            "the detail endpoint."
+        ),
+        parameters=[
+            ProcessListFilterSerializer,
+            OpenApiParameter('fields', str, description="With representation=full: comma-separated fields to return."),
+            OpenApiParameter('expand', str, description="With representation=full: comma-separated relations to embed."),
+        ],
+        responses={200: PolymorphicProxySerializer(
+            component_name='ManufacturingProcessListResponse',
+            serializers=[ProcessPageSerializer, ProcessBatchSummarySerializer, ProcessBatchFullSerializer],
+            resource_type_field_name=None,
+            many=False,  # already includes the page envelope
+        )},
+    )
+    def get(self, request, *args, **kwargs):
+        ids = self.get_filters().validated_data.get('ids')
+        if ids is None:
+            return super().get(request, *args, **kwargs)
+        return self.batch(ids)
+
+    def batch(self, ids):
+        queryset, options = self.get_queryset(), {}
+        serializer_class = self.get_serializer_class()
+        if self.get_filters().validated_data['representation'] == 'full':
+            serializer_class = WireManufacturingProcessSerializer
+            options = get_sparse_options(self.request, serializer_class)
+            queryset = queryset.with_details(**options)
+        processes = {process.pk: process for process in queryset}
+        found = [processes[pk] for pk in ids if pk in processes]
+        return Response({
+            "results": serializer_class(found, many=True, **options).data,
+            "missing": [pk for pk in ids if pk not in processes],
+        })
+
+@extend_schema(tags=['Wire - Master Workflow'])
+class ManufacturingProcessInboxView(generics.ListAPIView):
+    """
+    Processes waiting on the requesting user: the current step's actor group is
+    one of the user's groups. Superusers see every in-flight process.
+    The response adds per-stage counts for badge display.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = WireManufacturingProcessSummarySerializer
+    pagination_class = ProcessCursorPagination
+
+    def get_queryset(self):
+        if self.request.user.is_superuser:
+            return WireManufacturingProcess.objects.filter(is_completed=False)
+        auth = WireAuthorizationContext.for_request(self.request)
+        return WireManufacturingProcess.objects.actionable_by(auth.group_names)
+
+    @extend_schema(summary="List processes awaiting action by the current user")
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        counts = queryset.order_by().values('stage').annotate(count=Count('id'))
+        response.data['counts'] = {row['stage']: row['count'] for row in counts}
+        return response
+
+class FormSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=255, help_text="Prefix of a document code, trace code or license number.")
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+
+class FormSearchResultSerializer(serializers.Serializer):
+    form_type = serializers.CharField()
+    object_id = serializers.IntegerField()
+    workflow_id = serializers.IntegerField(allow_null=True)
+    document_code = serializers.CharField()
+    trace_code = serializers.CharField()
+    license_number = serializers.CharField()
+
+class FormSearchResponseSerializer(serializers.Serializer):
+    results = FormSearchResultSerializer(many=True)
+
+@extend_schema(tags=['Wire - Forms'])
+class FormSearchView(APIView):
+    """Find any workflow form by the start of its document code, trace code or license number."""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Search all workflow forms by code",
+        parameters=[FormSearchQuerySerializer],
+        responses={200: FormSearchResponseSerializer},
+    )
+    def get(self, request, *args, **kwargs):
+        query = FormSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        results = search_forms(query.validated_data['q'], limit=query.validated_data['limit'])
+        return Response({"results": list(results)})
+
 @extend_schema(tags=['Wire - Master Workflow'])
 class ManufacturingProcessDetailView(APIView):
     """Retrieve or delete a master manufacturing process."""
@@ -575,14 +916,47 @@ class ManufacturingProcessDetailView(APIView):
             return [IsSuperUser()]
         return super().get_permissions()
 
-    @extend_schema(summary="Get the status of a specific manufacturing process", responses={200: WireManufacturingProcessSerializer})
+    @extend_schema(
+        summary="Get the status of a specific manufacturing process",
+        description=(
+            "Send If-None-Match to get a 304 while nothing in the tree has changed. "
+            "Use ?fields=stage,current_step to return only some fields, and ?expand=authorization,... "
+            "to embed only some related forms; the others are returned as ids. "
+            "The full tree of a completed process is served from a stored snapshot."
+        ),
+        parameters=[
+            OpenApiParameter('fields', str, description="Comma-separated fields to return."),
+            OpenApiParameter('expand', str, description="Comma-separated relations to embed: raw_materials, "
+                             "authorization, checklist, production, product_final, actions."),
+        ],
+        responses={200: WireManufacturingProcessSerializer, 304: None},
+    )
     def get(self, request, pk, *args, **kwargs):
-        try:
-            process = WireManufacturingProcess.objects.get(pk=pk)
-            serializer = WireManufacturingProcessSerializer(process)
-            return Response(serializer.data)
-        except WireManufacturingProcess.DoesNotExist:
+        options = get_sparse_options(request, WireManufacturingProcessSerializer)
+        # Checked with one query before any of the tree is loaded or serialized.
+        stamps = WireManufacturingProcess.objects.filter(pk=pk).version_stamps().first()
+        if stamps is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        etag = make_etag('process', sorted(stamps.items()), options)
+        # A completed process is frozen, so its full tree is rendered once and
+        # then served from the stored snapshot while the ETag stays the same.
+        use_snapshot = stamps['is_completed'] and not options
+        validators = Validators(snapshot_etag(request, etag) if use_snapshot else etag)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        body = stored_snapshot(pk, etag) if use_snapshot else None
+        if body is None:
+            try:
+                process = WireManufacturingProcess.objects.with_details(**options).get(pk=pk)
+            except WireManufacturingProcess.DoesNotExist:
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            serializer = WireManufacturingProcessSerializer(process, **options)
+            if not use_snapshot:
+                return validators.apply(Response(serializer.data))
+            body = store_snapshot(pk, etag, serializer.data)
+        return validators.apply(snapshot_response(request, body))
 
     @extend_schema(summary="Delete a master process (Superuser only)")
     def delete(self, request, pk, *args, **kwargs):
@@ -594,10 +968,50 @@ class ManufacturingProcessDetailView(APIView):
             return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
 
+@extend_schema(tags=['Wire - Master Workflow'])
+class ProcessActionListView(generics.ListAPIView):
+    """
+    The full action history of one process, newest first, with keyset
+    pagination on (timestamp, id). The detail view embeds only the latest few.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ManufacturingProcessActionSerializer
+    pagination_class = ProcessActionCursorPagination
+
+    def get_queryset(self):
+        # User names come from the same query as the page of actions.
+        return ManufacturingProcessAction.objects.filter(process_id=self.kwargs['pk']).select_related('user')
+
+    @extend_schema(summary="List the action history of a manufacturing process")
+    def get(self, request, pk, *args, **kwargs):
+        if not WireManufacturingProcess.objects.filter(pk=pk).exists():
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return super().get(request, pk, *args, **kwargs)
+
+
 class PerformActionPayloadSerializer(serializers.Serializer):
     action = serializers.ChoiceField(choices=['approve', 'reject'])
     comment = serializers.CharField(required=False, allow_blank=True)
 
+class BulkActionItemSerializer(PerformActionPayloadSerializer):
+    process_id = serializers.IntegerField()
+
+class BulkActionPayloadSerializer(serializers.Serializer):
+    actions = BulkActionItemSerializer(many=True, allow_empty=False, max_length=200)
+
+class BulkActionResultSerializer(serializers.Serializer):
+    process_id = serializers.IntegerField()
+    success = serializers.BooleanField()
+    detail = serializers.CharField(required=False)
+    stage = serializers.CharField(required=False)
+    current_step = serializers.IntegerField(required=False)
+    is_completed = serializers.BooleanField(required=False)
+
+class BulkActionResponseSerializer(serializers.Serializer):
+    succeeded = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    results = BulkActionResultSerializer(many=True)
+
 # @extend_schema(tags=['Wire - Master Workflow'])
 # class PerformProcessActionView(APIView):
 #     """Approve or reject a step in the master workflow."""
@@ -621,13 +1035,13 @@ class PerformActionPayloadSerializer(serializers.Serializer):
 #         except WireManufacturingProcess.DoesNotExist:
 #             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 @extend_schema(tags=['Wire - Master Workflow'])
-class PerformProcessActionView(APIView):
+class PerformProcessActionView(IdempotencyMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
         summary="Approve or reject a step in the master workflow",
         request=PerformActionPayloadSerializer,
-        responses={200: WireManufacturingProcessSerializer},
+        responses={200: WireManufacturingProcessSerializer, 409: None},
         examples=[
             OpenApiExample(
                 'Approve Step',
@@ -651,15 +1065,49 @@ class PerformProcessActionView(APIView):
         serializer = PerformActionPayloadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        service = ManufacturingWorkflowService(user=request.user)
+        service = ManufacturingWorkflowService(user=request.user, auth=WireAuthorizationContext.for_request(request))
         try:
             updated_process = service.approve_or_reject_step(
                 process_id=pk,
                 **serializer.validated_data
             )
+            updated_process = WireManufacturingProcess.objects.with_details().get(pk=updated_process.pk)
             response_serializer = WireManufacturingProcessSerializer(updated_process)
             return Response(response_serializer.data)
         except (ValidationError, PermissionDenied) as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except WireManufacturingProcess.DoesNotExist:
-            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+@extend_schema(tags=['Wire - Master Workflow'])
+class BulkProcessActionView(IdempotencyMixin, APIView):
+    """Approve or reject the current step of many processes in one call."""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Approve or reject steps on many processes at once",
+        request=BulkActionPayloadSerializer,
+        responses={200: BulkActionResponseSerializer},
+        examples=[
+            OpenApiExample(
+                'End of Shift Sign-off',
+                value={
+                    "actions": [
+                        {"process_id": 12, "action": "approve"},
+                        {"process_id": 15, "action": "reject", "comment": "Spool count does not match"}
+                    ]
+                }
+            )
+        ]
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = BulkActionPayloadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        service = ManufacturingWorkflowService(user=request.user, auth=WireAuthorizationContext.for_request(request))
+        results = service.bulk_approve_or_reject(serializer.validated_data['actions'])
+        return Response({
+            "succeeded": sum(1 for r in results if r['success']),
+            "failed": sum(1 for r in results if not r['success']),
+            "results": results,
+        })
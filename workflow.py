@@ -1,4 +1,22 @@
 # apps/wire/workflow.py
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+# Production row fields an operator fills in at production step 2.
+PRODUCTION_DATA_FIELDS = [
+    "input_spool_length",
+    "input_spool_number",
+    "output_spool_length",
+    "output_spool_number",
+    "input_tank_number",
+    "output_tank_number",
+    "input_spool_remaining_length"
+]
 
 WIRE_WORKFLOW = {
     "rawmaterial": {
@@ -167,15 +185,7 @@ WIRE_WORKFLOW = {
                 "actor_permission": "OP",
                 "action": "Fill production data fields.",
                 "details": {
-                    "fields": [
-                        "input_spool_length",
-                        "input_spool_number",
-                        "output_spool_length",
-                        "output_spool_number",
-                        "input_tank_number",
-                        "output_tank_number",
-                        "input_spool_remaining_length"
-                    ]
+                    "fields": PRODUCTION_DATA_FIELDS
                 },
                 "on_reject": None
             },
@@ -253,3 +263,260 @@ WIRE_WORKFLOW = {
     }
 }
 
+
+# --- Field-Level Write Policies ----------------------------------------------
+# Which payload keys a group may send when PATCHing a form. Each entry applies to
+# one form model; "stage"/"step" narrow it (omitted = any), "group" is the user's
+# group ("*" = any other group, superusers exempt). Keys:
+#   allow         top-level keys the payload may contain (omitted = any)
+#   allow_nested  {list field: keys each nested item may contain}
+#   deny_nested   {list field: keys no nested item may contain}
+#   deny          True to reject every payload, even an empty one
+# A group with no matching entry is unrestricted.
+
+WIRE_FIELD_POLICIES = [
+    {
+        "form": "devicechecklist",
+        "group": "QC",
+        # QC can edit anything EXCEPT operator_approval in the nested tests
+        "deny_nested": {"qc_tests_wire": ["operator_approval"]},
+        "nested_message": "QC users cannot change the 'operator_approval' field.",
+    },
+    {
+        "form": "devicechecklist",
+        "group": "OP",
+        # Operator can ONLY edit operator_approval in nested tests
+        "allow": ["qc_tests_wire"],
+        "allow_nested": {"qc_tests_wire": ["id", "operator_approval"]},
+        "message": "Operators can only modify 'qc_tests_wire' data.",
+        "nested_message": "Operators can only submit 'id' and 'operator_approval' for a test.",
+    },
+    {
+        "form": "deviceproduction",
+        "stage": "production",
+        "step": 1,
+        "group": "QC",
+        "allow": ["document_code", "license_number", "trace_date", "trace_code", "description"],
+        "message": "At this step, QC can only fill out Form Specification fields.",
+    },
+    {
+        "form": "deviceproduction",
+        "stage": "production",
+        "step": 2,
+        "group": "OP",
+        "allow": ["production"],
+        "allow_nested": {"production": ["id", *PRODUCTION_DATA_FIELDS]},
+        "message": "At this step, Operators can only submit production data.",
+        "nested_message": "Invalid fields submitted for production data. Allowed: {allowed}",
+    },
+    {
+        "form": "deviceproduct",
+        "group": "QC",
+    },
+    {
+        "form": "deviceproduct",
+        "group": "*",
+        "deny": True,
+        "message": "Only QC users can create or edit the final product form.",
+    },
+]
+
+
+# --- Compiled State Machine --------------------------------------------------
+
+
+@dataclass(frozen=True)
+class WorkflowStep:
+    """
+    A single, immutable step of the workflow with its transitions resolved.
+    """
+    stage: str
+    step: int
+    actor_permission: str
+    action: str
+    details: Mapping
+    on_reject: Optional[Mapping]
+    # Where an approval of this step leads. `completes_process` is set on the
+    # last step of the last stage, where next_stage/next_step are None.
+    is_last_step: bool
+    next_stage: Optional[str]
+    next_step: Optional[int]
+    completes_process: bool
+
+    @property
+    def can_reject(self):
+        return self.on_reject is not None
+
+    @property
+    def reject_to_step(self):
+        return self.on_reject['go_to_step'] if self.on_reject else None
+
+    @property
+    def reject_message(self):
+        if not self.on_reject:
+            return None
+        return self.on_reject.get('message', "A rejection reason is required.")
+
+
+class FieldPolicy:
+    """
+    A compiled WIRE_FIELD_POLICIES entry: precomputed key sets checked with
+    set operations, so the cost only depends on the payload size.
+    """
+    def __init__(self, rule):
+        self.denied = rule.get('deny', False)
+        allow = rule.get('allow')
+        self.allowed = frozenset(allow) if allow is not None else None
+        self.allowed_nested = {key: frozenset(keys) for key, keys in rule.get('allow_nested', {}).items()}
+        self.denied_nested = {key: frozenset(keys) for key, keys in rule.get('deny_nested', {}).items()}
+        self.nested_keys = frozenset(self.allowed_nested) | frozenset(self.denied_nested)
+        self.message = rule.get('message', "You cannot modify these fields at this step.")
+        self.nested_message = rule.get('nested_message', self.message)
+
+    def check(self, data):
+        """Returns an error message if `data` breaks the policy, otherwise None."""
+        if self.denied:
+            return self.message
+        keys = data.keys()
+        if self.allowed is not None and not self.allowed.issuperset(keys):
+            return self.message
+
+        for key in self.nested_keys.intersection(keys):
+            allowed = self.allowed_nested.get(key)
+            denied = self.denied_nested.get(key, frozenset())
+            for item in data.get(key) or []:
+                item_keys = item.keys()
+                if (allowed is not None and not allowed.issuperset(item_keys)) or not denied.isdisjoint(item_keys):
+                    return self.nested_message.format(allowed=sorted(allowed or ()))
+        return None
+
+
+def _freeze(value):
+    """Recursively converts dicts/lists from the raw config into read-only equivalents."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class WorkflowStateMachine:
+    """
+    WIRE_WORKFLOW compiled into O(1) lookups.
+
+    Built once at app load (see WireConfig.ready) and shared by the service,
+    permissions and serializers; validation errors surface at startup rather
+    than on the first request that hits a broken step.
+    """
+    def __init__(self, config, field_policies=()):
+        self.stages = tuple(config.keys())
+        if not self.stages:
+            raise ImproperlyConfigured("The wire workflow must define at least one stage.")
+
+        steps = {}
+        steps_by_group = {}
+        for stage_index, stage in enumerate(self.stages):
+            stage_steps = self._validate_stage(stage, config[stage])
+            following_stage = self.stages[stage_index + 1] if stage_index + 1 < len(self.stages) else None
+
+            for raw_step in stage_steps:
+                number = raw_step['step']
+                is_last_step = number == len(stage_steps)
+                if not is_last_step:
+                    next_stage, next_step = stage, number + 1
+                elif following_stage:
+                    next_stage, next_step = following_stage, 1
+                else:
+                    next_stage, next_step = None, None
+
+                step = WorkflowStep(
+                    stage=stage,
+                    step=number,
+                    actor_permission=raw_step['actor_permission'],
+                    action=raw_step.get('action', ''),
+                    details=_freeze(raw_step.get('details') or {}),
+                    on_reject=_freeze(raw_step.get('on_reject')),
+                    is_last_step=is_last_step,
+                    next_stage=next_stage,
+                    next_step=next_step,
+                    completes_process=next_stage is None,
+                )
+                steps[(stage, number)] = step
+                steps_by_group.setdefault(step.actor_permission, []).append((stage, number))
+
+        self._steps = MappingProxyType(steps)
+        self._steps_by_group = MappingProxyType({
+            group: frozenset(keys) for group, keys in steps_by_group.items()
+        })
+        self._field_policies = MappingProxyType(self._compile_field_policies(field_policies))
+
+    def _compile_field_policies(self, field_policies):
+        """Expands each rule to every (form, stage, step, group) it covers."""
+        compiled = {}
+        for rule in field_policies:
+            stage, step_number = rule.get('stage'), rule.get('step')
+            if stage is not None and stage not in self.stages:
+                raise ImproperlyConfigured(f"Field policy for '{rule['form']}' references unknown stage '{stage}'.")
+            if step_number is not None and (stage is None or (stage, step_number) not in self._steps):
+                raise ImproperlyConfigured(f"Field policy for '{rule['form']}' references unknown step {stage}/{step_number}.")
+
+            policy = FieldPolicy(rule)
+            for stage_name, number in self._steps:
+                if stage in (None, stage_name) and step_number in (None, number):
+                    key = (rule['form'], stage_name, number, rule['group'])
+                    if key in compiled:
+                        raise ImproperlyConfigured(f"Overlapping field policies for {key}.")
+                    compiled[key] = policy
+        return compiled
+
+    @staticmethod
+    def _validate_stage(stage, stage_config):
+        stage_steps = sorted(stage_config.get('steps', []), key=lambda s: s.get('step', 0))
+        if not stage_steps:
+            raise ImproperlyConfigured(f"Workflow stage '{stage}' has no steps.")
+
+        numbers = [s.get('step') for s in stage_steps]
+        if numbers != list(range(1, len(stage_steps) + 1)):
+            raise ImproperlyConfigured(f"Workflow stage '{stage}' steps must be numbered 1..n, got {numbers}.")
+
+        for raw_step in stage_steps:
+            if not raw_step.get('actor_permission'):
+                raise ImproperlyConfigured(f"Workflow step {stage}/{raw_step['step']} has no 'actor_permission'.")
+            on_reject = raw_step.get('on_reject')
+            if on_reject and on_reject.get('go_to_step') not in numbers:
+                raise ImproperlyConfigured(
+                    f"Workflow step {stage}/{raw_step['step']} rejects to unknown step {on_reject.get('go_to_step')}."
+                )
+        return stage_steps
+
+    @property
+    def first_stage(self):
+        return self.stages[0]
+
+    def get_step(self, stage, step):
+        """Returns the WorkflowStep for (stage, step), or None if it does not exist."""
+        return self._steps.get((stage, step))
+
+    def steps_for_group(self, group_name):
+        """Returns the (stage, step) pairs a group is the actor for."""
+        return self._steps_by_group.get(group_name, frozenset())
+
+    @property
+    def groups(self):
+        return frozenset(self._steps_by_group)
+
+    def get_field_policy(self, form, stage, step, group, is_superuser=False):
+        """
+        Returns the FieldPolicy for a user in `group` editing a `form` (model name)
+        while the process is at (stage, step), or None when unrestricted.
+        """
+        policy = self._field_policies.get((form, stage, step, group))
+        if policy is None and not is_superuser:
+            policy = self._field_policies.get((form, stage, step, '*'))
+        return policy
+
+
+@lru_cache(maxsize=None)
+def get_workflow_state_machine():
+    """Returns the process-wide compiled workflow, compiling it on first use."""
+    return WorkflowStateMachine(WIRE_WORKFLOW, WIRE_FIELD_POLICIES)